@@ -0,0 +1,197 @@
+import argparse
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from typing import Iterable, Iterator
+
+import attrs
+import pandas as pd
+from nba_api.stats.endpoints import PlayByPlayV2
+
+from dimensions import Dimensions, categorical_keys
+from game_fetcher import fetch_games
+from output_writers import OUTPUT_FORMATS, write_table
+from play_table import PlayTable
+from player_stats_engine import compute_player_stats
+from season_refresh import (
+    DIMENSIONS,
+    PLAYER_STATS,
+    PLAYER_STATS_KEYS,
+    SEASON_KEYS,
+    VALUE_STOCKS,
+    game_player_stats,
+    get_season_game_ids,
+)
+from value_stock_engine import compute_value_stocks
+
+_BACKFILL_PATH = os.environ.get("NBA_BACKFILL_PATH", ".nba_backfill")
+_CHUNK_SIZE = 100
+_REQUESTS_PER_SECOND = 2.0
+_SEASON_TYPES = ("Regular Season", "Playoffs")
+_VALUE_STOCKS_KEYS = ["ATTRIBUTED_PLAYER_ID"] + SEASON_KEYS
+
+
+@attrs.frozen
+class BackfillTask:
+    season: str
+    season_type: str
+    chunk: int
+    game_ids: tuple[str, ...]
+
+    def partition(self, root: str) -> str:
+        return os.path.join(root, f"season={self.season}", f"season_type={self.season_type}")
+
+    def partial_path(self, root: str, kind: str) -> str:
+        # The dimensions are a directory holding their players and teams tables
+        extension = "" if kind == DIMENSIONS else ".parquet"
+        return os.path.join(self.partition(root), f"{kind}-{self.chunk:04d}{extension}")
+
+
+def season_range(first_season: str, last_season: str) -> list[str]:
+    """Expands two seasons such as '2018-19' and '2022-23' into every season in between, both included."""
+    first_year, last_year = int(first_season[:4]), int(last_season[:4])
+    return [f"{year}-{(year + 1) % 100:02d}" for year in range(first_year, last_year + 1)]
+
+
+def plan_tasks(seasons: Iterable[str], season_types: Iterable[str], chunk_size: int = _CHUNK_SIZE) -> Iterator[BackfillTask]:
+    season_types = list(season_types)
+    for season in seasons:
+        for season_type in season_types:
+            game_ids = get_season_game_ids(season, season_type)
+            for chunk, start in enumerate(range(0, len(game_ids), chunk_size)):
+                yield BackfillTask(season, season_type, chunk, tuple(game_ids[start : start + chunk_size]))
+
+
+def run_task(task: BackfillTask, root: str, requests_per_second: float = _REQUESTS_PER_SECOND) -> BackfillTask:
+    """
+    Computes the player stats and value stocks of one chunk of games and writes them to the task's partition.
+    Runs inside a worker process, so the rate limit here is this worker's share of the overall budget.
+    """
+    play_tables = {
+        game_id: PlayTable.from_endpoint(play_by_play)
+        for game_id, play_by_play in fetch_games(
+            PlayByPlayV2, task.game_ids, requests_per_second=requests_per_second, final=True
+        )
+    }
+    # In game id order rather than download order, so the dimensions hold each player's latest team
+    play_table = PlayTable.concat(play_tables[game_id] for game_id in sorted(play_tables))
+    player_stats = game_player_stats(compute_player_stats(play_table), task.season, task.season_type)
+    value_stocks = compute_value_stocks(play_table).assign(SEASON=task.season, SEASON_TYPE=task.season_type)
+
+    os.makedirs(task.partition(root), exist_ok=True)
+    player_stats.to_parquet(task.partial_path(root, PLAYER_STATS), index=False)
+    value_stocks.to_parquet(task.partial_path(root, VALUE_STOCKS), index=False)
+    Dimensions.from_play_table(play_table).write(task.partial_path(root, DIMENSIONS))
+    return task
+
+
+def _partition_dimensions(tasks: list[BackfillTask], root: str) -> dict[tuple[str, str], Dimensions]:
+    """
+    The dimensions of every (season, season type) partition of `tasks`. Chunks are numbered in game list order,
+    so the later chunks take precedence and each player gets their latest team of that season.
+    """
+    partitions = collections.defaultdict(list)
+    for task in sorted(tasks, key=lambda task: task.chunk):
+        partitions[task.season, task.season_type].append(Dimensions.read(task.partial_path(root, DIMENSIONS)))
+    return {partition: Dimensions.concat(dimensions) for partition, dimensions in partitions.items()}
+
+
+def _read_partials(tasks: list[BackfillTask], root: str, kind: str, columns: list[str]) -> pd.DataFrame:
+    partials = [pd.read_parquet(task.partial_path(root, kind)) for task in tasks]
+    partials = pd.concat(partials, ignore_index=True) if partials else pd.DataFrame(columns=columns)
+    return categorical_keys(partials, SEASON_KEYS)
+
+
+def reduce_partials(tasks: Iterable[BackfillTask], root: str = _BACKFILL_PATH) -> pd.DataFrame:
+    """
+    Reduces the partials written by `tasks` into one table with a row per player, season and season type, holding
+    the games played, the stocks, the value stocks and the points off stocks. Partitions of other runs under
+    `root` are left out.
+    """
+    tasks = list(tasks)
+    player_stats = (
+        _read_partials(tasks, root, PLAYER_STATS, PLAYER_STATS_KEYS + ["GAME_ID", "STOCKS"])
+        .groupby(PLAYER_STATS_KEYS, observed=True)
+        .agg({"GAME_ID": "sum", "STOCKS": "sum"})
+        .reset_index()
+    )
+    value_stocks = (
+        _read_partials(tasks, root, VALUE_STOCKS, _VALUE_STOCKS_KEYS + ["VALUE_STOCK", "POINTS_OFF_STOCK"])
+        .groupby(_VALUE_STOCKS_KEYS, observed=True)
+        .agg({"VALUE_STOCK": "sum", "POINTS_OFF_STOCK": "sum"})
+        .reset_index()
+    )
+    merged = pd.merge(
+        player_stats,
+        value_stocks,
+        left_on=["PLAYER_ID"] + SEASON_KEYS,
+        right_on=["ATTRIBUTED_PLAYER_ID"] + SEASON_KEYS,
+        how="left",
+    )
+    merged = merged.drop(columns="ATTRIBUTED_PLAYER_ID")
+    merged = merged.rename(columns={"GAME_ID": "GAMES_PLAYED"})
+    merged[["VALUE_STOCK", "POINTS_OFF_STOCK"]] = merged[["VALUE_STOCK", "POINTS_OFF_STOCK"]].fillna(0)
+    if merged.empty:  # No completed games yet
+        return Dimensions.empty().with_player_names(merged)
+    # A row is labelled with the player's team in its own season, not in the latest season of the backfill
+    dimensions = _partition_dimensions(tasks, root)
+    named = [
+        dimensions[partition].with_player_names(rows)
+        for partition, rows in merged.groupby(SEASON_KEYS, observed=True, sort=False)
+    ]
+    return pd.concat(named).sort_index().reset_index(drop=True)
+
+
+def backfill(
+    seasons: Iterable[str],
+    season_types: Iterable[str] = _SEASON_TYPES,
+    root: str = _BACKFILL_PATH,
+    processes: int | None = None,
+    chunk_size: int = _CHUNK_SIZE,
+    requests_per_second: float = _REQUESTS_PER_SECOND,
+) -> pd.DataFrame:
+    """
+    Recomputes every (season, season type) pair across a process pool, one task per chunk of games, and reduces
+    the partitioned partials into a single cross-season table.
+    """
+    processes = processes or os.cpu_count() or 1
+    tasks = list(plan_tasks(seasons, season_types, chunk_size))
+    for partition in {task.partition(root) for task in tasks}:
+        shutil.rmtree(partition, ignore_errors=True)  # Stale chunks of an earlier run would be reduced twice
+
+    logging.info("Backfilling %s chunks of games across %s processes", len(tasks), processes)
+    # Planning may have opened the sqlite response cache and catalog, whose connections must not be forked
+    spawn = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, mp_context=spawn) as executor:
+        futures = [executor.submit(run_task, task, root, requests_per_second / processes) for task in tasks]
+        for future in concurrent.futures.as_completed(futures):
+            task = future.result()
+            logging.info("Done %s %s chunk %s (%s games)", task.season, task.season_type, task.chunk, len(task.game_ids))
+    return reduce_partials(tasks, root)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Backfill value stocks over a range of seasons and season types")
+    parser.add_argument("first_season", help="e.g. 2018-19")
+    parser.add_argument("last_season", nargs="?", help="defaults to the first season")
+    parser.add_argument("--season-type", action="append", dest="season_types", help="repeatable, defaults to all")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=_CHUNK_SIZE)
+    parser.add_argument("--output", default="stocks_backfill", help="file name without the extension")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, help="csv by default, xlsx is opt-in")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    table = backfill(
+        season_range(args.first_season, args.last_season or args.first_season),
+        args.season_types or _SEASON_TYPES,
+        processes=args.processes,
+        chunk_size=args.chunk_size,
+    )
+    write_table(table, args.output, args.format)
+    print("Runtime: {:.2f} seconds".format(time.time() - start_time))
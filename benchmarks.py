@@ -0,0 +1,187 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import time
+import tracemalloc
+from typing import Any, Callable, Iterable, Iterator
+
+import attrs
+import numpy as np
+import pandas as pd
+
+from pbp_mapping import label_plays
+from play_patterns import OFFENSIVE_REBOUND_FLOW, PLAY_NAMES, PatternMatcher
+from play_table import PlayTable
+from player_stats_engine import compute_player_stats
+from synthetic_pbp import SyntheticGame, generate_games, generate_season_scale
+from try_and_try_more import get_value_stock_players_id
+from value_stock_engine import compute_value_stocks
+
+_RESULTS_PATH = "benchmark_results.json"
+_CHUNK_GAMES = 1230  # One regular season
+
+
+@attrs.frozen
+class BenchmarkResult:
+    name: str
+    games: int
+    plays: int
+    seconds: float
+    games_per_second: float
+    peak_memory_bytes: int | None
+
+    def combine(self, other: "BenchmarkResult") -> "BenchmarkResult":
+        """The result over the games of both runs, e.g. two chunks of the same scale."""
+        games, seconds = self.games + other.games, self.seconds + other.seconds
+        peak_memory = None
+        if self.peak_memory_bytes is not None and other.peak_memory_bytes is not None:
+            peak_memory = max(self.peak_memory_bytes, other.peak_memory_bytes)
+        return BenchmarkResult(self.name, games, self.plays + other.plays, seconds, games / seconds, peak_memory)
+
+
+def _value_stocks(games: list[SyntheticGame]) -> Any:
+    play_table = PlayTable.concat(PlayTable.from_play_by_play(game.play_by_play) for game in games)
+    return compute_value_stocks(play_table)
+
+
+def _player_stats(games: list[SyntheticGame]) -> Any:
+    play_table = PlayTable.concat(PlayTable.from_play_by_play(game.play_by_play) for game in games)
+    return compute_player_stats(play_table)
+
+
+def _rebound_flow(games: list[SyntheticGame]) -> Any:
+    matcher = PatternMatcher((OFFENSIVE_REBOUND_FLOW,), PLAY_NAMES)
+    counts = matcher.new_counts()
+    for game in games:
+        matcher.scan(PlayTable.from_play_by_play(game.play_by_play), counts)
+    return counts
+
+
+def _play_labels(games: list[SyntheticGame]) -> Any:
+    return [label_plays(PlayTable.from_play_by_play(game.play_by_play), game.play_by_play) for game in games]
+
+
+def _stock_scan(games: list[SyntheticGame]) -> Any:
+    return [get_value_stock_players_id(PlayTable.from_play_by_play(game.play_by_play)) for game in games]
+
+
+BENCHMARKS: dict[str, Callable[[list[SyntheticGame]], Any]] = {
+    "value_stocks": _value_stocks,
+    "player_stats": _player_stats,
+    "poc_rebound_flow": _rebound_flow,
+    "pbp_mapping_labels": _play_labels,
+    "try_and_try_more_scan": _stock_scan,
+}
+
+
+def run_benchmark(
+    name: str, games: list[SyntheticGame], repeat: int = 3, measure_memory: bool = True
+) -> BenchmarkResult:
+    """
+    Times the benchmark `repeat` times and keeps the fastest run. Peak memory comes from one extra run under
+    tracemalloc, which is kept out of the timings because it slows the allocations down.
+    """
+    benchmark = BENCHMARKS[name]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark(games)
+        timings.append(time.perf_counter() - start)
+
+    peak_memory = None
+    if measure_memory:
+        tracemalloc.start()
+        benchmark(games)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    seconds = min(timings)
+    plays = sum(len(game.play_by_play) for game in games)
+    return BenchmarkResult(name, len(games), plays, seconds, len(games) / seconds, peak_memory)
+
+
+def _environment() -> dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _chunks(games: Iterable[SyntheticGame], size: int) -> Iterator[list[SyntheticGame]]:
+    games = iter(games)
+    while chunk := list(itertools.islice(games, size)):
+        yield chunk
+
+
+def run_suite(
+    games: Iterable[SyntheticGame],
+    names: list[str] | None = None,
+    repeat: int = 3,
+    measure_memory: bool = True,
+    chunk_games: int = _CHUNK_GAMES,
+) -> dict[str, Any]:
+    """
+    Runs the benchmarks on `games` one chunk of `chunk_games` at a time, so a generator of many seasons never
+    has more than a chunk in memory. Timings add up over the chunks and the peak memory is the largest chunk's.
+    """
+    results = {}
+    for chunk in _chunks(games, chunk_games):
+        for name in names or list(BENCHMARKS):
+            result = run_benchmark(name, chunk, repeat, measure_memory)
+            results[name] = results[name].combine(result) if name in results else result
+        logging.info("Benchmarked %s games", next(iter(results.values())).games)
+    for result in results.values():
+        logging.info("%s: %.1f games/s over %s games", result.name, result.games_per_second, result.games)
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": _environment(),
+        "results": [attrs.asdict(result) for result in results.values()],
+    }
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any]) -> dict[str, float]:
+    """Speed-up of every benchmark in `report` over the same benchmark in `baseline` (above 1 is faster)."""
+    baseline_results = {result["name"]: result for result in baseline["results"]}
+    return {
+        result["name"]: result["games_per_second"] / baseline_results[result["name"]]["games_per_second"]
+        for result in report["results"]
+        if result["name"] in baseline_results
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    parser = argparse.ArgumentParser(description="Offline benchmarks on synthetic play by play data")
+    scale = parser.add_mutually_exclusive_group()
+    scale.add_argument("--games", type=int, default=100, help="number of games (default 100)")
+    scale.add_argument("--seasons", type=int, help="number of full regular seasons, 1230 games each")
+    parser.add_argument("--benchmark", action="append", choices=list(BENCHMARKS), help="repeatable, defaults to all")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-games", type=int, default=_CHUNK_GAMES, help="games generated and benchmarked at once")
+    parser.add_argument("--output", default=_RESULTS_PATH)
+    parser.add_argument("--baseline", help="an earlier results file to compare against")
+    args = parser.parse_args()
+
+    # The games are generated lazily, chunk by chunk, as the suite goes through them
+    if args.seasons:
+        games = generate_season_scale(args.seasons, seed=args.seed)
+    else:
+        games = generate_games(args.games, seed=args.seed)
+    report = run_suite(games, args.benchmark, args.repeat, not args.no_memory, args.chunk_games)
+    game_count = report["results"][0]["games"] if report["results"] else 0
+    report["scale"] = {"games": game_count, "seasons": args.seasons, "chunk_games": args.chunk_games, "seed": args.seed}
+    with open(args.output, "w") as results_file:
+        json.dump(report, results_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            for name, speedup in compare(report, json.load(baseline_file)).items():
+                print(f"{name}: {speedup:.2f}x")
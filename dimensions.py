@@ -0,0 +1,125 @@
+import os
+from typing import Iterable
+
+import attrs
+import numpy as np
+import pandas as pd
+
+from play_table import PLAYER_SLOTS, PlayTable, player_appearances
+
+_PLAYERS_FILE = "players.parquet"
+_TEAMS_FILE = "teams.parquet"
+
+
+def categorical_keys(frame: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Turns string key columns such as SEASON into categoricals, which group and merge much faster."""
+    return frame.astype({column: "category" for column in columns})
+
+
+def _appearances(plays: pd.DataFrame, slot: int) -> pd.DataFrame:
+    appeared = player_appearances(plays, slot)
+    return pd.DataFrame(
+        {
+            "ROW": np.flatnonzero(appeared),
+            "PLAYER_ID": plays[f"PLAYER{slot}_ID"].to_numpy()[appeared],
+            "TEAM_ID": plays[f"PLAYER{slot}_TEAM_ID"].to_numpy()[appeared],
+        }
+    )
+
+
+@attrs.frozen
+class Dimensions:
+    """
+    Player and team dimension tables keyed by integer id: `players` holds PLAYER_NAME and the TEAM_ID of the
+    player's latest game, `teams` holds TEAM_ABBREVIATION. Aggregations group on the ids only and the names
+    are joined when a table is written out, so a traded player or a new spelling of a name stays one key.
+    """
+
+    players: pd.DataFrame
+    teams: pd.DataFrame
+
+    @classmethod
+    def empty(cls) -> "Dimensions":
+        return cls(
+            pd.DataFrame(
+                {"PLAYER_NAME": pd.Series(dtype=object), "TEAM_ID": pd.Series(dtype=np.int64)},
+                index=pd.Index([], dtype=np.int64, name="PLAYER_ID"),
+            ),
+            pd.DataFrame(
+                {"TEAM_ABBREVIATION": pd.Series(dtype=object)}, index=pd.Index([], dtype=np.int64, name="TEAM_ID")
+            ),
+        )
+
+    @classmethod
+    def from_play_table(cls, play_table: PlayTable) -> "Dimensions":
+        appearances = pd.concat([_appearances(play_table.plays, slot) for slot in PLAYER_SLOTS], ignore_index=True)
+        # Plays are in game order, so the last appearance is the player's latest team
+        latest = appearances.sort_values("ROW", kind="stable").drop_duplicates("PLAYER_ID", keep="last")
+        players = pd.DataFrame(
+            {
+                "PLAYER_NAME": latest["PLAYER_ID"].map(play_table.player_names).to_numpy(),
+                "TEAM_ID": latest["TEAM_ID"].to_numpy(dtype=np.int64),
+            },
+            index=pd.Index(latest["PLAYER_ID"].to_numpy(dtype=np.int64), name="PLAYER_ID"),
+        )
+        teams = pd.DataFrame(
+            {"TEAM_ABBREVIATION": list(play_table.team_abbreviations.values())},
+            index=pd.Index(list(play_table.team_abbreviations), dtype=np.int64, name="TEAM_ID"),
+        )
+        return cls(players.sort_index(), teams.sort_index())
+
+    @classmethod
+    def concat(cls, dimensions: Iterable["Dimensions"]) -> "Dimensions":
+        """Combines the dimensions of consecutive batches of games, the later batches taking precedence."""
+        dimensions = list(dimensions)
+        if not dimensions:
+            return cls.empty()
+
+        def latest(tables: list[pd.DataFrame]) -> pd.DataFrame:
+            table = pd.concat(tables)
+            return table[~table.index.duplicated(keep="last")].sort_index()
+
+        return cls(
+            latest([dimension.players for dimension in dimensions]), latest([dimension.teams for dimension in dimensions])
+        )
+
+    def write(self, directory: str) -> None:
+        """Writes `players` and `teams` as plain Parquet tables, which outlive changes to pandas or to this class."""
+        os.makedirs(directory, exist_ok=True)
+        self.players.reset_index().to_parquet(os.path.join(directory, _PLAYERS_FILE), index=False)
+        self.teams.reset_index().to_parquet(os.path.join(directory, _TEAMS_FILE), index=False)
+
+    @classmethod
+    def read(cls, directory: str) -> "Dimensions":
+        return cls(
+            pd.read_parquet(os.path.join(directory, _PLAYERS_FILE)).set_index("PLAYER_ID"),
+            pd.read_parquet(os.path.join(directory, _TEAMS_FILE)).set_index("TEAM_ID"),
+        )
+
+    def with_player_names(
+        self,
+        frame: pd.DataFrame,
+        id_column: str = "PLAYER_ID",
+        name_column: str = "PLAYER_NAME",
+        team_column: str | None = "TEAM_ABBREVIATION",
+    ) -> pd.DataFrame:
+        """
+        `frame` with the player's name, and the abbreviation of the player's latest team unless `team_column`
+        is None, inserted right after `id_column`.
+        """
+        frame = frame.copy()
+        position = frame.columns.get_loc(id_column) + 1
+        player_ids = frame[id_column].astype(np.int64)
+        frame.insert(position, name_column, player_ids.map(self.players["PLAYER_NAME"]).to_numpy())
+        if team_column is not None:
+            teams = player_ids.map(self.players["TEAM_ID"]).map(self.teams["TEAM_ABBREVIATION"])
+            frame.insert(position + 1, team_column, teams.to_numpy())
+        return frame
+
+    def with_team_names(
+        self, frame: pd.DataFrame, id_column: str = "TEAM_ID", name_column: str = "TEAM_ABBREVIATION"
+    ) -> pd.DataFrame:
+        frame = frame.copy()
+        abbreviations = frame[id_column].astype(np.int64).map(self.teams["TEAM_ABBREVIATION"])
+        frame.insert(frame.columns.get_loc(id_column) + 1, name_column, abbreviations.to_numpy())
+        return frame
@@ -0,0 +1,57 @@
+import attrs
+import numpy as np
+
+
+@attrs.frozen
+class EventRuns:
+    """
+    Events collapsed into runs of consecutive events in the same group (e.g. game and period) at the same
+    game time, such as the free throws of one trip. `positions` is the row of the first event of each run and
+    `values` the sum over the run.
+    """
+
+    positions: np.ndarray
+    times: np.ndarray
+    groups: np.ndarray
+    values: np.ndarray
+
+    @classmethod
+    def from_events(cls, positions: np.ndarray, times: np.ndarray, groups: np.ndarray, values: np.ndarray) -> "EventRuns":
+        starts = np.ones(len(positions), dtype=bool)
+        starts[1:] = (groups[1:] != groups[:-1]) | (times[1:] != times[:-1])
+        first_events = np.flatnonzero(starts)
+        run_values = np.add.reduceat(values, first_events) if len(first_events) else values[:0]
+        return cls(positions[first_events], times[first_events], groups[first_events], run_values)
+
+
+def first_run_within_window(
+    anchor_positions: np.ndarray,
+    anchor_times: np.ndarray,
+    anchor_groups: np.ndarray,
+    runs: EventRuns,
+    window_seconds: int,
+    stop_positions: np.ndarray,
+) -> np.ndarray:
+    """
+    For every anchor, the index of the first run that starts after it in the same group, within
+    `window_seconds` of game time and no later than the first stop event after the anchor, or -1.
+    Positions are row numbers in play order and must be sorted, so each lookup is a binary search and the
+    whole join is O(n log n) however many anchors and runs there are.
+    """
+    if len(runs.positions) == 0:
+        return np.full(len(anchor_positions), -1)
+
+    following = np.searchsorted(runs.positions, anchor_positions, side="right")
+    candidate = np.minimum(following, len(runs.positions) - 1)
+    next_stop_index = np.searchsorted(stop_positions, anchor_positions, side="right")
+    next_stop = np.append(stop_positions, np.iinfo(np.int64).max)[next_stop_index]
+
+    elapsed = runs.times[candidate] - anchor_times
+    matched = (
+        (following < len(runs.positions))
+        & (runs.groups[candidate] == anchor_groups)
+        & (elapsed >= 0)
+        & (elapsed <= window_seconds)
+        & (runs.positions[candidate] <= next_stop)
+    )
+    return np.where(matched, candidate, -1)
@@ -0,0 +1,224 @@
+import argparse
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable
+
+import attrs
+from nba_api.stats.endpoints import LeagueGameLog
+
+from response_cache import fetch_endpoint
+
+_CATALOG_PATH = os.environ.get("NBA_CATALOG_PATH", os.path.join(".nba_cache", "games.sqlite3"))
+_REFRESH_TTL_SECONDS = float(os.environ.get("NBA_CATALOG_TTL", 6 * 60 * 60))
+_NBA_LEAGUE_ID = "00"
+_HOME_MARKER = " vs. "
+_COLUMNS = (
+    "game_id", "season", "season_type", "game_date", "home_team_id", "home_team", "away_team_id", "away_team",
+    "completed",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id TEXT PRIMARY KEY,
+    season TEXT NOT NULL,
+    season_type TEXT NOT NULL,
+    game_date TEXT NOT NULL,
+    home_team_id INTEGER NOT NULL,
+    home_team TEXT NOT NULL,
+    away_team_id INTEGER NOT NULL,
+    away_team TEXT NOT NULL,
+    completed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_season ON games (season, season_type, game_date);
+CREATE INDEX IF NOT EXISTS games_game_date ON games (game_date);
+CREATE INDEX IF NOT EXISTS games_home_team ON games (home_team, game_date);
+CREATE INDEX IF NOT EXISTS games_away_team ON games (away_team, game_date);
+CREATE TABLE IF NOT EXISTS refreshes (
+    season TEXT NOT NULL,
+    season_type TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (season, season_type)
+);
+"""
+
+
+@attrs.frozen
+class GameDetails:
+    game_id: str
+    season: str
+    season_type: str
+    game_date: str
+    home_team_id: int
+    home_team: str
+    away_team_id: int
+    away_team: str
+    completed: bool
+
+    @property
+    def matchup(self) -> str:
+        return f"{self.home_team}{_HOME_MARKER}{self.away_team}"
+
+    @classmethod
+    def from_team_games(cls, season: str, season_type: str, team_games: list[dict[str, Any]]) -> "GameDetails":
+        """
+        Builds the game from its team-game rows of LeagueGameLog or LeagueGameFinder, one per team. The home team
+        is the one whose MATCHUP reads "vs.", e.g. "GSW vs. LAL" against "LAL @ GSW".
+        """
+        home = next((row for row in team_games if _HOME_MARKER in row["MATCHUP"]), team_games[0])
+        away = next((row for row in team_games if row is not home), None)
+        if away is None:
+            # Only one side is listed, the opponent is the last word of its matchup
+            opponent = home["MATCHUP"].split()[-1]
+            away = {"TEAM_ID": 0, "TEAM_ABBREVIATION": opponent}
+        return cls(
+            str(home["GAME_ID"]),
+            season,
+            season_type,
+            str(home["GAME_DATE"])[:10],
+            int(home["TEAM_ID"]),
+            home["TEAM_ABBREVIATION"],
+            int(away["TEAM_ID"]),
+            away["TEAM_ABBREVIATION"],
+            all(row.get("WL") for row in team_games),
+        )
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "GameDetails":
+        return cls(*row[:-1], bool(row[-1]))
+
+
+def games_from_team_games(season: str, season_type: str, team_games: Iterable[dict[str, Any]]) -> list[GameDetails]:
+    """One `GameDetails` per GAME_ID out of the team-game rows, in the order the games first appear."""
+    rows_by_game: dict[str, list[dict[str, Any]]] = {}
+    for team_game in team_games:
+        rows_by_game.setdefault(team_game["GAME_ID"], []).append(team_game)
+    return [GameDetails.from_team_games(season, season_type, rows) for rows in rows_by_game.values()]
+
+
+@attrs.define
+class GameCatalog:
+    """
+    On-disk catalog of one row per game, filled from the league game log of every season and season type it
+    is asked about, and queried by game id, season, team and date range. A season is fetched again once its
+    last refresh is older than `refresh_ttl` seconds, so games finished since then are picked up.
+    """
+
+    path: str = _CATALOG_PATH
+    refresh_ttl: float = _REFRESH_TTL_SECONDS
+    _connection: sqlite3.Connection = attrs.field(init=False)
+    _lock: threading.Lock = attrs.field(init=False, factory=threading.Lock)
+
+    def __attrs_post_init__(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=60)
+        self._connection.executescript(_SCHEMA)
+
+    def upsert(self, games: Iterable[GameDetails]) -> None:
+        rows = [attrs.astuple(game) for game in games]
+        with self._lock, self._connection:
+            self._connection.executemany(f"INSERT OR REPLACE INTO games VALUES ({', '.join('?' * len(_COLUMNS))})", rows)
+
+    def refresh(self, season: str, season_type: str) -> int:
+        logging.info("Fetching all games for season year %s and type %s", season, season_type)
+        # The catalog owns the refresh policy, a cached game log would hide the games finished since it was stored
+        team_games = fetch_endpoint(
+            LeagueGameLog, use_cache=False, season=season, season_type_all_star=season_type, league_id=_NBA_LEAGUE_ID
+        ).get_normalized_dict()["LeagueGameLog"]
+        games = games_from_team_games(season, season_type, team_games)
+        self.upsert(games)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO refreshes VALUES (?, ?, ?)", (season, season_type, time.time())
+            )
+        return len(games)
+
+    def is_stale(self, season: str, season_type: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT refreshed_at FROM refreshes WHERE season = ? AND season_type = ?", (season, season_type)
+            ).fetchone()
+        return row is None or row[0] + self.refresh_ttl <= time.time()
+
+    def ensure(self, season: str, season_type: str) -> None:
+        if self.is_stale(season, season_type):
+            self.refresh(season, season_type)
+
+    def game(self, game_id: str) -> GameDetails | None:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM games WHERE game_id = ?", (game_id,)
+            ).fetchone()
+        return None if row is None else GameDetails.from_row(row)
+
+    def games(
+        self,
+        season: str | None = None,
+        season_type: str | None = None,
+        team: str | None = None,
+        date_from: str | None = None,
+        date_to: str | None = None,
+        completed: bool | None = None,
+    ) -> list[GameDetails]:
+        """Games matching every given filter, by date. `team` is an abbreviation and dates are inclusive YYYY-MM-DD."""
+        conditions, parameters = [], []
+        for condition, value in (
+            ("season = ?", season),
+            ("season_type = ?", season_type),
+            ("game_date >= ?", date_from),
+            ("game_date <= ?", date_to),
+            ("completed = ?", completed),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        if team is not None:
+            conditions.append("(home_team = ? OR away_team = ?)")
+            parameters.extend([team, team])
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM games{where} ORDER BY game_date, game_id", parameters
+            ).fetchall()
+        return [GameDetails.from_row(row) for row in rows]
+
+
+@functools.lru_cache(maxsize=None)
+def get_catalog() -> GameCatalog:
+    return GameCatalog()
+
+
+def select_games(season: str, season_type: str, catalog: GameCatalog | None = None, **filters: Any) -> list[GameDetails]:
+    """The games of a season and season type matching `filters` (see `GameCatalog.games`), refreshing when stale."""
+    catalog = catalog or get_catalog()
+    catalog.ensure(season, season_type)
+    return catalog.games(season=season, season_type=season_type, **filters)
+
+
+def select_game_ids(season: str, season_type: str, catalog: GameCatalog | None = None, **filters: Any) -> list[str]:
+    return [game.game_id for game in select_games(season, season_type, catalog, **filters)]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    parser = argparse.ArgumentParser(description="List the games of a season from the local game catalog")
+    parser.add_argument("season", help="e.g. 2022-23")
+    parser.add_argument("season_type", help="e.g. Playoffs")
+    parser.add_argument("--team", help="team abbreviation, home or away")
+    parser.add_argument("--date-from", help="YYYY-MM-DD, inclusive")
+    parser.add_argument("--date-to", help="YYYY-MM-DD, inclusive")
+    parser.add_argument("--refresh", action="store_true", help="fetch the season again even if it is fresh")
+    args = parser.parse_args()
+
+    if args.refresh:
+        get_catalog().refresh(args.season, args.season_type)
+    for game in select_games(
+        args.season, args.season_type, team=args.team, date_from=args.date_from, date_to=args.date_to
+    ):
+        print(f"{game.game_id}  {game.game_date}  {game.matchup}{'' if game.completed else '  (not completed)'}")
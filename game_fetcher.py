@@ -0,0 +1,131 @@
+import concurrent.futures
+import logging
+import random
+import threading
+import time
+from typing import Any, Iterable, Iterator
+
+import attrs
+import requests
+from nba_api.stats.library.http import NBAStatsHTTP
+from requests.adapters import HTTPAdapter
+
+from instrumentation import get_recorder
+from response_cache import ResponseCache, StatsRequestError, fetch_endpoint
+
+_MAX_WORKERS = 8
+_REQUESTS_PER_SECOND = 2.0
+_BURST = 4
+_MAX_RETRIES = 5
+_BACKOFF_BASE_SECONDS = 1.0
+_BACKOFF_CAP_SECONDS = 30.0
+_RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+_RETRY_EXCEPTIONS = (requests.Timeout, requests.ConnectionError)
+
+_session_lock = threading.Lock()
+_session_pool_size = 0
+
+
+@attrs.define
+class TokenBucket:
+    rate: float
+    capacity: float
+    _tokens: float = attrs.field(init=False)
+    _updated: float = attrs.field(init=False, factory=time.monotonic)
+    _lock: threading.Lock = attrs.field(init=False, factory=threading.Lock)
+
+    def __attrs_post_init__(self) -> None:
+        self._tokens = self.capacity
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, StatsRequestError):
+        return error.status_code in _RETRY_STATUS_CODES
+    return isinstance(error, _RETRY_EXCEPTIONS)
+
+
+def _backoff_seconds(attempt: int) -> float:
+    return random.uniform(0, min(_BACKOFF_CAP_SECONDS, _BACKOFF_BASE_SECONDS * 2**attempt))
+
+
+def _install_pooled_session(pool_size: int) -> None:
+    """
+    Gives nba_api a session pooling `pool_size` connections. The session is kept across fetchers so its
+    keep-alive connections are reused, and only replaced when a fetcher needs a larger pool.
+    """
+    global _session_pool_size
+    with _session_lock:
+        if pool_size <= _session_pool_size:
+            return
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        NBAStatsHTTP.set_session(session)
+        _session_pool_size = pool_size
+
+
+@attrs.define
+class GameFetcher:
+    """
+    Fetches one endpoint for many games on a bounded thread pool. Requests that miss the response cache are
+    throttled by a shared token bucket and retried with jittered exponential backoff on timeouts, connection
+    errors and throttling responses. Set `final` when every game is over, so the responses are cached for good.
+    """
+
+    max_workers: int = _MAX_WORKERS
+    requests_per_second: float = _REQUESTS_PER_SECOND
+    burst: float = _BURST
+    max_retries: int = _MAX_RETRIES
+    cache: ResponseCache | None = None
+    final: bool = False
+    _bucket: TokenBucket = attrs.field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._bucket = TokenBucket(self.requests_per_second, self.burst)
+        _install_pooled_session(self.max_workers)
+
+    def _fetch_with_retries(self, endpoint_cls: type, game_id: str) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fetch_endpoint(
+                    endpoint_cls, cache=self.cache, before_request=self._bucket.acquire, final=self.final, game_id=game_id
+                )
+            except Exception as error:
+                if attempt == self.max_retries or not is_retryable(error):
+                    raise
+                backoff = _backoff_seconds(attempt)
+                get_recorder().count("retries")
+                logging.warning("Retrying game id %s in %.1f seconds after: %s", game_id, backoff, error)
+                time.sleep(backoff)
+
+    def fetch(self, endpoint_cls: type, game_ids: Iterable[str]) -> Iterator[tuple[str, Any]]:
+        """Yields (game id, endpoint) pairs in completion order."""
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {
+                executor.submit(self._fetch_with_retries, endpoint_cls, game_id): game_id for game_id in game_ids
+            }
+            for future in concurrent.futures.as_completed(futures):
+                # Dropping the finished future lets the caller free each endpoint as soon as it is done with it
+                game_id = futures.pop(future)
+                yield game_id, future.result()
+        finally:
+            # A failed game or a caller that stops early leaves the queued downloads nobody will read
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_games(endpoint_cls: type, game_ids: Iterable[str], **fetcher_options: Any) -> Iterator[tuple[str, Any]]:
+    return GameFetcher(**fetcher_options).fetch(endpoint_cls, game_ids)
@@ -0,0 +1,180 @@
+import collections
+import contextlib
+import cProfile
+import csv
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Iterator
+
+import attrs
+import numpy as np
+
+_REPORT_PATH = os.environ.get("NBA_REPORT_PATH", ".nba_reports")
+_PROFILE_MODE = os.environ.get("NBA_PROFILE", "")  # "cprofile" or "tracemalloc"
+_PERCENTILES = (50, 90, 99)
+
+
+@attrs.define
+class RunRecorder:
+    """
+    Collects the timings and counters of one run: wall time per pipeline stage, metrics per game (fetch seconds,
+    bytes received, rows, transform and write seconds) and plain counters such as cache hits and retries.
+    Safe to use from the fetcher's worker threads.
+    """
+
+    name: str = "run"
+    started_at: float = attrs.field(factory=time.time)
+    _stages: dict[str, float] = attrs.field(init=False, factory=lambda: collections.defaultdict(float))
+    _counters: collections.Counter = attrs.field(init=False, factory=collections.Counter)
+    _games: dict[str, dict[str, float]] = attrs.field(
+        init=False, factory=lambda: collections.defaultdict(lambda: collections.defaultdict(float))
+    )
+    _samples: dict[str, list[float]] = attrs.field(init=False, factory=lambda: collections.defaultdict(list))
+    _lock: threading.Lock = attrs.field(init=False, factory=threading.Lock)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._stages[name] += elapsed
+
+    @contextlib.contextmanager
+    def time_game(self, game_id: str, metric: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_game(game_id, metric, time.perf_counter() - start)
+
+    def record_game(self, game_id: str, metric: str, value: float) -> None:
+        with self._lock:
+            self._games[game_id][metric] += value
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def observe(self, name: str, value: float) -> None:
+        """Keeps a sample that is not tied to a game, e.g. the peak memory of one call."""
+        with self._lock:
+            self._samples[name].append(value)
+
+    def report(self) -> dict[str, Any]:
+        with self._lock:
+            metrics = collections.defaultdict(list)
+            for game_metrics in self._games.values():
+                for metric, value in game_metrics.items():
+                    metrics[metric].append(value)
+            return {
+                "name": self.name,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+                "wall_seconds": time.time() - self.started_at,
+                "stages": dict(self._stages),
+                "counters": dict(self._counters),
+                "games": len(self._games),
+                "per_game": {metric: _summary(values) for metric, values in metrics.items()},
+                "samples": {name: _summary(values) for name, values in self._samples.items()},
+            }
+
+    def game_rows(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [{"GAME_ID": game_id, **metrics} for game_id, metrics in self._games.items()]
+
+    def write(self, directory: str = _REPORT_PATH) -> str:
+        """Writes `<name>-<timestamp>.json` with the summary and a `.csv` with one row per game, returns the prefix."""
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(directory, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))}")
+        with open(f"{prefix}.json", "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+        rows = self.game_rows()
+        columns = ["GAME_ID"] + sorted({metric for row in rows for metric in row} - {"GAME_ID"})
+        with open(f"{prefix}.csv", "w", newline="") as games_file:
+            writer = csv.DictWriter(games_file, fieldnames=columns, restval=0)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        _write_profile(prefix)
+        logging.info("Run report written to %s.json", prefix)
+        return prefix
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    summary = {"count": len(values), "total": float(np.sum(values)), "max": float(np.max(values))}
+    for percentile, value in zip(_PERCENTILES, np.percentile(values, _PERCENTILES)):
+        summary[f"p{percentile}"] = float(value)
+    return summary
+
+
+@functools.lru_cache(maxsize=None)
+def get_recorder() -> RunRecorder:
+    return RunRecorder()
+
+
+def start_run(name: str) -> RunRecorder:
+    """Names the run and restarts its clock, call it once at the top of a script."""
+    recorder = get_recorder()
+    recorder.name = name
+    recorder.started_at = time.time()
+    return recorder
+
+
+_profiler = cProfile.Profile() if _PROFILE_MODE == "cprofile" else None
+_profile_depth = 0
+
+
+def _write_profile(prefix: str) -> None:
+    if _profiler is not None:
+        _profiler.dump_stats(f"{prefix}.prof")
+
+
+def profiled(function: Callable) -> Callable:
+    """
+    Optional profiling hook for the hot per-game functions. With NBA_PROFILE=cprofile their calls are profiled
+    into the run's `.prof` file, with NBA_PROFILE=tracemalloc their peak allocation is recorded per call.
+    Without NBA_PROFILE the function is returned untouched.
+    """
+    if _PROFILE_MODE == "cprofile":
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            global _profile_depth
+            # Only the outermost profiled call toggles the profiler, nested ones are already covered
+            _profile_depth += 1
+            if _profile_depth == 1:
+                _profiler.enable()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _profile_depth -= 1
+                if _profile_depth == 0:
+                    _profiler.disable()
+
+        return wrapper
+
+    if _PROFILE_MODE == "tracemalloc":
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            try:
+                return function(*args, **kwargs)
+            finally:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                get_recorder().observe(f"{function.__qualname__}_peak_bytes", peak)
+
+        return wrapper
+
+    return function
@@ -0,0 +1,232 @@
+import argparse
+import logging
+import os
+import time
+from typing import Callable
+
+import attrs
+import numpy as np
+import pandas as pd
+import requests
+from nba_api.stats.endpoints import PlayByPlayV2
+
+from dimensions import Dimensions
+from game_fetcher import is_retryable
+from instrumentation import get_recorder, start_run
+from output_writers import write_table
+from play_keywords import TeamSide
+from play_patterns import OFFENSIVE_REBOUND_FLOW, PLAY_NAMES, PatternMatcher, counts_table
+from play_table import PlayTable
+from response_cache import StatsRequestError, fetch_endpoint
+from synthetic_pbp import generate_games
+from value_stock_engine import MAX_TIME_DIFF, ValueStockTracker
+
+_POLL_SECONDS = float(os.environ.get("NBA_LIVE_POLL_SECONDS", 10))
+_REPLAY_SPEED = 60.0
+_END_OF_PERIOD = 13
+_REGULATION_PERIODS = 4
+_TOP_PLAYERS = 5
+
+
+@attrs.define
+class LiveGame:
+    """
+    Incremental analysis of one game in progress. Every `update` takes the game's full play by play as the
+    endpoint returns it and only processes the events after the last processed EVENTNUM, keeping open pattern
+    matches and pending stocks between updates. When an event that was already processed is edited, removed or
+    shows up late, the game is processed again from the start.
+    """
+
+    game_id: str
+    matcher: PatternMatcher
+    window_seconds: int = MAX_TIME_DIFF
+    last_eventnum: int = attrs.field(init=False, default=0)
+    counts: dict = attrs.field(init=False)
+    value_stocks: ValueStockTracker = attrs.field(init=False)
+    dimensions: Dimensions = attrs.field(init=False, factory=Dimensions.empty)
+    final: bool = attrs.field(init=False, default=False)
+    _active: list = attrs.field(init=False, factory=list)
+    _fingerprints: np.ndarray = attrs.field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        self.last_eventnum = 0
+        self.counts = self.matcher.new_counts()
+        self.value_stocks = ValueStockTracker(self.window_seconds)
+        self.final = False
+        self._active = []
+        self._fingerprints = np.empty(0, dtype=np.uint64)
+
+    def _processed_rows(self, play_by_play: pd.DataFrame, fingerprints: np.ndarray) -> int | None:
+        """How many leading rows were already processed, or None if any of them changed since."""
+        processed = play_by_play["EVENTNUM"].to_numpy() <= self.last_eventnum
+        count = int(processed.sum())
+        if count != len(self._fingerprints) or not processed[:count].all():
+            return None
+        if not np.array_equal(fingerprints[:count], self._fingerprints):
+            return None
+        return count
+
+    def update(self, play_by_play: pd.DataFrame) -> int:
+        """Processes the new events of the game's play by play and returns how many there were."""
+        play_by_play = play_by_play.reset_index(drop=True)
+        fingerprints = pd.util.hash_pandas_object(play_by_play, index=False).to_numpy()
+        processed = self._processed_rows(play_by_play, fingerprints)
+        if processed is None:
+            logging.warning("Earlier events of game %s were corrected, processing it again", self.game_id)
+            get_recorder().count("live_corrections")
+            self._reset()
+            processed = 0
+
+        new_plays = play_by_play.iloc[processed:]
+        if new_plays.empty:
+            return 0
+
+        play_table = PlayTable.from_play_by_play(new_plays)
+        self.dimensions = Dimensions.concat([self.dimensions, Dimensions.from_play_table(play_table)])
+        self._active = self.matcher.feed_plays(play_table.plays, self._active, self.counts)
+        self.value_stocks.update(play_table.plays)
+
+        self._fingerprints = fingerprints
+        self.last_eventnum = max(self.last_eventnum, int(new_plays["EVENTNUM"].max()))
+        last_play = play_table.plays.iloc[-1]
+        scores = self.value_stocks.scores
+        self.final = bool(
+            last_play["EVENTMSGTYPE"] == _END_OF_PERIOD
+            and last_play["PERIOD"] >= _REGULATION_PERIODS
+            and scores[TeamSide.HOME] != scores[TeamSide.AWAY]
+        )
+        return len(new_plays)
+
+    def value_stock_totals(self) -> pd.DataFrame:
+        return self.value_stocks.totals()
+
+    def pattern_counts(self, pattern_name: str) -> pd.DataFrame:
+        return counts_table(self.counts[pattern_name])
+
+
+@attrs.define
+class GameReplay:
+    """
+    Local stand-in for the play by play endpoint of a game in progress: replays a recorded game, releasing each
+    event once its game time has passed on a clock running `speed` times faster than real time.
+    """
+
+    play_by_play: pd.DataFrame
+    speed: float = _REPLAY_SPEED
+    clock: Callable[[], float] = time.monotonic
+    _release_seconds: np.ndarray = attrs.field(init=False)
+    _started_at: float | None = attrs.field(init=False, default=None)
+    _released: int = attrs.field(init=False, default=0)
+
+    def __attrs_post_init__(self) -> None:
+        self.play_by_play = self.play_by_play.reset_index(drop=True)
+        seconds = PlayTable.from_play_by_play(self.play_by_play).plays["GAME_SECONDS"].to_numpy()
+        self._release_seconds = np.maximum.accumulate(seconds)
+
+    @property
+    def finished(self) -> bool:
+        return self._released == len(self.play_by_play)
+
+    def __call__(self, game_id: str) -> pd.DataFrame:
+        if self._started_at is None:
+            self._started_at = self.clock()
+        game_seconds = (self.clock() - self._started_at) * self.speed
+        self._released = int(np.searchsorted(self._release_seconds, game_seconds, side="right"))
+        return self.play_by_play.iloc[: self._released]
+
+
+def fetch_live_play_by_play(game_id: str) -> pd.DataFrame:
+    # The play by play of a game in progress changes between polls, so it must not be served from the cache
+    return fetch_endpoint(PlayByPlayV2, use_cache=False, game_id=game_id).get_data_frames()[0]
+
+
+def follow_game(
+    live_game: LiveGame,
+    fetch_play_by_play: Callable[[str], pd.DataFrame] = fetch_live_play_by_play,
+    poll_seconds: float = _POLL_SECONDS,
+    on_update: Callable[[LiveGame], None] | None = None,
+    finished: Callable[[], bool] | None = None,
+) -> LiveGame:
+    """
+    Polls the game every `poll_seconds` and feeds the new events to `live_game` until the game is final, or
+    until `finished` says so (e.g. a replay ran out of events).
+    """
+    recorder = get_recorder()
+    while True:
+        try:
+            play_by_play = fetch_play_by_play(live_game.game_id)
+        except (StatsRequestError, requests.RequestException) as error:
+            if not is_retryable(error):
+                raise
+            logging.warning("Polling game %s failed: %s", live_game.game_id, error)
+        else:
+            recorder.count("live_polls")
+            start = time.perf_counter()
+            new_events = live_game.update(play_by_play)
+            recorder.observe("live_update_seconds", time.perf_counter() - start)
+            if new_events and on_update is not None:
+                on_update(live_game)
+            if live_game.final or (finished is not None and finished()):
+                return live_game
+        time.sleep(poll_seconds)
+
+
+def _log_update(live_game: LiveGame) -> None:
+    top_players = live_game.value_stock_totals().nlargest(_TOP_PLAYERS, "VALUE_STOCK")
+    value_stocks = live_game.dimensions.with_player_names(
+        top_players, "ATTRIBUTED_PLAYER_ID", "ATTRIBUTED_PLAYER", team_column=None
+    )
+    logging.info(
+        "Game %s up to event %s: %s",
+        live_game.game_id,
+        live_game.last_eventnum,
+        ", ".join(f"{row.ATTRIBUTED_PLAYER} {row.VALUE_STOCK}" for row in value_stocks.itertuples()) or "no value stocks",
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    parser = argparse.ArgumentParser(description="Follow the value stocks and offensive rebound flows of a game live")
+    parser.add_argument("game_id", nargs="?", help="required unless --synthetic is given")
+    parser.add_argument("--poll-seconds", type=float, default=_POLL_SECONDS)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--replay", action="store_true", help="replay the recorded play by play of a finished game")
+    source.add_argument("--synthetic", action="store_true", help="replay a synthetic game instead")
+    parser.add_argument("--speed", type=float, default=_REPLAY_SPEED, help="replay speed over real time")
+    parser.add_argument("--format", help="output format of the final value stocks")
+    args = parser.parse_args()
+    if args.game_id is None and not args.synthetic:
+        parser.error("game_id is required unless --synthetic is given")
+
+    recorder = start_run("live_game")
+    replay = None
+    if args.synthetic:
+        synthetic_game = next(generate_games(1))
+        args.game_id = synthetic_game.game_id
+        replay = GameReplay(synthetic_game.play_by_play, args.speed)
+    elif args.replay:
+        replay = GameReplay(fetch_endpoint(PlayByPlayV2, game_id=args.game_id).get_data_frames()[0], args.speed)
+
+    play_pattern = OFFENSIVE_REBOUND_FLOW
+    live_game = LiveGame(args.game_id, PatternMatcher((play_pattern,), PLAY_NAMES))
+    follow_game(
+        live_game,
+        replay if replay is not None else fetch_live_play_by_play,
+        args.poll_seconds,
+        _log_update,
+        (lambda: replay.finished) if replay is not None else None,
+    )
+    dimensions = live_game.dimensions
+    write_table(
+        dimensions.with_player_names(
+            live_game.value_stock_totals(), "ATTRIBUTED_PLAYER_ID", "ATTRIBUTED_PLAYER", "ATTRIBUTED_TEAM"
+        ),
+        f"live_value_stocks_{args.game_id}",
+        args.format,
+    )
+    rebound_flows = dimensions.with_player_names(live_game.pattern_counts(play_pattern.name), team_column=None)
+    logging.info("Offensive rebound flows:\n%s", rebound_flows.to_string(index=False))
+    recorder.write()
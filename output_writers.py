@@ -0,0 +1,154 @@
+import abc
+import csv
+import os
+from typing import Any
+
+import attrs
+import pandas as pd
+
+_DEFAULT_FORMAT = os.environ.get("NBA_OUTPUT_FORMAT", "csv")
+_EXCEL_MAX_ROWS = 1_048_575  # One row of the sheet is taken by the header
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError("Parquet and Arrow IPC output need pyarrow, install it or use the csv format") from error
+    return pyarrow
+
+
+def _arrow_table(pyarrow, chunk: pd.DataFrame, schema: Any) -> Any:
+    if schema is not None:
+        return pyarrow.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+    table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+    return table.cast(pyarrow.schema([_stable_field(pyarrow, field) for field in table.schema]))
+
+
+def _stable_field(pyarrow, field: Any) -> Any:
+    # A column that is empty in the first chunk (e.g. no descriptions yet) would otherwise be typed null forever
+    if pyarrow.types.is_null(field.type):
+        return pyarrow.field(field.name, pyarrow.string())
+    # Categoricals get a new dictionary per chunk, which an IPC file cannot hold, so write their plain values
+    if pyarrow.types.is_dictionary(field.type):
+        return pyarrow.field(field.name, field.type.value_type)
+    return field
+
+
+@attrs.define
+class TableWriter(abc.ABC):
+    """
+    Appends DataFrame chunks with the same columns to one output file, so callers can write per game or per
+    chunk instead of concatenating everything first. Use as a context manager to close the file.
+    """
+
+    path: str
+    rows: int = attrs.field(init=False, default=0)
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        self._write(chunk)
+        self.rows += len(chunk)
+
+    @abc.abstractmethod
+    def _write(self, chunk: pd.DataFrame) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+@attrs.define
+class CsvWriter(TableWriter):
+    _file: Any = attrs.field(init=False, default=None)
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        if self._file is None:
+            self._file = open(self.path, "w", newline="")
+            chunk.to_csv(self._file, index=False, quoting=csv.QUOTE_MINIMAL)
+        else:
+            chunk.to_csv(self._file, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+@attrs.define
+class ParquetWriter(TableWriter):
+    _writer: Any = attrs.field(init=False, default=None)
+    _schema: Any = attrs.field(init=False, default=None)
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        pyarrow = _arrow()
+        table = _arrow_table(pyarrow, chunk, self._schema)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+@attrs.define
+class ArrowIpcWriter(TableWriter):
+    _writer: Any = attrs.field(init=False, default=None)
+    _schema: Any = attrs.field(init=False, default=None)
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        pyarrow = _arrow()
+        table = _arrow_table(pyarrow, chunk, self._schema)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = pyarrow.ipc.new_file(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+@attrs.define
+class XlsxWriter(TableWriter):
+    """
+    Opt-in Excel output for small summary tables. Excel cannot stream, so the chunks are buffered until close,
+    and anything past the sheet's row limit is refused instead of being truncated.
+    """
+
+    _chunks: list[pd.DataFrame] = attrs.field(init=False, factory=list)
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        if self.rows + len(chunk) > _EXCEL_MAX_ROWS:
+            raise ValueError(f"{self.path} would exceed Excel's {_EXCEL_MAX_ROWS} rows, use csv, parquet or arrow")
+        self._chunks.append(chunk)
+
+    def close(self) -> None:
+        if self._chunks:
+            pd.concat(self._chunks, ignore_index=True).to_excel(self.path, index=False)
+            self._chunks = []
+
+
+_WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter, "arrow": ArrowIpcWriter, "xlsx": XlsxWriter}
+OUTPUT_FORMATS = tuple(_WRITERS)
+
+
+def open_writer(name: str, output_format: str | None = None) -> TableWriter:
+    """Opens `<name>.<format>` for appending chunks, the format defaults to $NBA_OUTPUT_FORMAT or csv."""
+    output_format = output_format or _DEFAULT_FORMAT
+    if output_format not in _WRITERS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {', '.join(OUTPUT_FORMATS)}")
+    return _WRITERS[output_format](f"{name}.{output_format}")
+
+
+def write_table(table: pd.DataFrame, name: str, output_format: str | None = None) -> str:
+    with open_writer(name, output_format) as writer:
+        writer.write(table)
+    return writer.path
@@ -1,38 +1,34 @@
 import pandas as pd
 import numpy as np
 from nba_api.stats.endpoints import PlayByPlayV2
+from game_fetcher import fetch_games
+from instrumentation import profiled, start_run
+from output_writers import open_writer
+from play_keywords import Keyword, TeamSide
+from play_table import PlayTable
 
 games = ['0042200404', '0042200405', '0042200403', '0042200402', '0042200401']
+TEAM_NAMES = np.array([side.name for side in sorted(TeamSide)])
 
-all_data = []
-for g in games:
-    play = PlayByPlayV2(game_id=g)
-    df = play.get_data_frames()[0]
-
-    # Define a function to determine the team based on description
-    def determine_team(home_description, visitor_description):
-        if pd.notnull(home_description) and pd.notnull(visitor_description):
-            if 'STEAL' in visitor_description or 'BLOCK' in visitor_description:
-                return 'HOME'
-            elif 'STEAL' in home_description or 'BLOCK' in home_description:
-                return 'AWAY'
-        elif pd.notnull(home_description):
-            return 'HOME'
-        elif pd.notnull(visitor_description):
-            return 'AWAY'
-        return 'UNKNOWN'  # Provide a default value for the 'TEAM' column
-
-    # Apply the function to create the "TEAM" column
-    df['TEAM'] = df.apply(lambda row: determine_team(row['HOMEDESCRIPTION'], row['VISITORDESCRIPTION']), axis=1)
+
+@profiled
+def label_plays(play_table, play_by_play):
+    # Every raw column of the play by play is exported, the labels are computed from the normalized plays
+    plays = play_table.plays
+    df = play_by_play.reset_index(drop=True).copy()
+
+    # Name the side the play belongs to, already attributed from the descriptions when the table was built
+    df['TEAM'] = TEAM_NAMES[plays['TEAM_SIDE'].to_numpy()]
 
     # Define conditions and corresponding values for the "CURRENT_PLAY" column
+    keywords = plays['HOME_KEYWORDS'] | plays['AWAY_KEYWORDS']
     conditions = [
-        df['HOMEDESCRIPTION'].str.contains('STEAL', case=False, na=False) | df['VISITORDESCRIPTION'].str.contains('STEAL', case=False, na=False),
-        df['HOMEDESCRIPTION'].str.contains('BLOCK', case=False, na=False) | df['VISITORDESCRIPTION'].str.contains('BLOCK', case=False, na=False),
-        df['EVENTMSGTYPE'] == 2,
-        df['EVENTMSGTYPE'] == 1,
-        (df['EVENTMSGTYPE'] == 4) & (df['TEAM'] == df['TEAM'].shift(1)),
-        (df['EVENTMSGTYPE'] == 4) & (df['TEAM'] != df['TEAM'].shift(1)),
+        (keywords & Keyword.STEAL.value) != 0,
+        (keywords & Keyword.BLOCK.value) != 0,
+        plays['EVENTMSGTYPE'] == 2,
+        plays['EVENTMSGTYPE'] == 1,
+        (plays['EVENTMSGTYPE'] == 4) & (plays['TEAM_SIDE'] == plays['TEAM_SIDE'].shift(1)),
+        (plays['EVENTMSGTYPE'] == 4) & (plays['TEAM_SIDE'] != plays['TEAM_SIDE'].shift(1)),
     ]
     choices = ['STEAL', 'BLOCK', 'FG_MISSED', 'FG_MADE', 'OFFENSIVE REBOUND', 'DEFENSIVE REBOUND']
 
@@ -40,19 +36,32 @@ for g in games:
     df['CURRENT_PLAY'] = np.select(conditions, choices, default='OTHER')
     df['NEXT_PLAY'] = df['CURRENT_PLAY'].shift(-1)
 
-    # Extract minutes and seconds from PCTIMESTRING column
-    df[['MINUTES', 'SECONDS']] = df['PCTIMESTRING'].str.split(':', expand=True)
+    # Split the game clock into minutes and seconds, already parsed from PCTIMESTRING into the integer CLOCK
+    clock = plays['CLOCK'].astype(np.int64)
+    df['MINUTES'] = clock // 60
+    df['SECONDS'] = clock % 60
 
     # Calculate the difference in time between each play
-    df['MINUTES_DIFF'] = df['MINUTES'].shift().astype(float) - df['MINUTES'].astype(float)
-    df['SECONDS_DIFF'] = (df['SECONDS'].shift().astype(float) - df['SECONDS'].astype(float))/60
-    df['TIME_DIFF'] = (df['MINUTES_DIFF']+df['SECONDS_DIFF'])*60
+    df['MINUTES_DIFF'] = df['MINUTES'].shift() - df['MINUTES']
+    df['SECONDS_DIFF'] = (df['SECONDS'].shift() - df['SECONDS']) / 60
+    df['TIME_DIFF'] = clock.shift() - clock
 
     # Add the "ATTRIBUTED_PLAYER" column based on the logic
-    df['ATTRIBUTED_PLAYER'] = np.where(df['CURRENT_PLAY'] == 'STEAL', df['PLAYER2_NAME'],
-                                       np.where(df['CURRENT_PLAY'] == 'BLOCK', 'PLAYER3_NAME', df['PLAYER1_NAME']))
+    attributed_player_id = np.where(df['CURRENT_PLAY'] == 'STEAL', plays['PLAYER2_ID'],
+                                    np.where(df['CURRENT_PLAY'] == 'BLOCK', plays['PLAYER3_ID'], plays['PLAYER1_ID']))
+    df['ATTRIBUTED_PLAYER'] = pd.Series(attributed_player_id, index=df.index).map(play_table.player_names)
 
-    all_data.append(df)
+    return df
 
-combined_df = pd.concat(all_data)
-combined_df.to_excel('play_by_play_2.xlsx', index=False)
+if __name__ == "__main__":
+    # Every raw play by play column is kept, so the labelled plays are appended game by game instead of
+    # being concatenated into one frame (set NBA_OUTPUT_FORMAT=xlsx for the old spreadsheet)
+    recorder = start_run('pbp_mapping')
+    with open_writer('play_by_play_2') as writer:
+        for g, play in fetch_games(PlayByPlayV2, games, final=True):
+            with recorder.time_game(g, 'transform_seconds'):
+                play_by_play = play.get_data_frames()[0]
+                labelled_plays = label_plays(PlayTable.from_play_by_play(play_by_play), play_by_play)
+            with recorder.time_game(g, 'write_seconds'):
+                writer.write(labelled_plays)
+    recorder.write()
@@ -0,0 +1,97 @@
+import enum
+import re
+
+import numpy as np
+import pandas as pd
+
+
+class Keyword(enum.IntFlag):
+    """
+    Keywords found in a play description. Flags are iterable, so pandas mistakes them for sequences: mask
+    columns with their `.value`.
+    """
+
+    STEAL = enum.auto()
+    BLOCK = enum.auto()
+    MISS = enum.auto()
+    REBOUND = enum.auto()
+    ASSIST = enum.auto()
+    THREE_POINTER = enum.auto()
+    FREE_THROW = enum.auto()
+    TURNOVER = enum.auto()
+    BAD_PASS = enum.auto()
+    LOST_BALL = enum.auto()
+    TRAVELING = enum.auto()
+    OUT_OF_BOUNDS = enum.auto()
+    FOUL = enum.auto()
+    VIOLATION = enum.auto()
+    SUBSTITUTION = enum.auto()
+    TIMEOUT = enum.auto()
+    JUMP_BALL = enum.auto()
+
+
+STOCK = (Keyword.STEAL | Keyword.BLOCK).value
+
+
+@enum.unique
+class TeamSide(enum.IntEnum):
+    UNKNOWN = 0
+    HOME = 1
+    AWAY = 2
+
+
+# The tokens never overlap, so a single non-overlapping scan finds all of them
+_TOKENS = {
+    "STEAL": Keyword.STEAL,
+    "BLOCK": Keyword.BLOCK,
+    "MISS": Keyword.MISS,
+    "REBOUND": Keyword.REBOUND,
+    " AST)": Keyword.ASSIST,
+    "3PT": Keyword.THREE_POINTER,
+    "FREE THROW": Keyword.FREE_THROW,
+    "TURNOVER": Keyword.TURNOVER,
+    "BAD PASS": Keyword.BAD_PASS,
+    "LOST BALL": Keyword.LOST_BALL,
+    "TRAVELING": Keyword.TRAVELING,
+    "OUT OF BOUNDS": Keyword.OUT_OF_BOUNDS,
+    "FOUL": Keyword.FOUL,
+    "VIOLATION": Keyword.VIOLATION,
+    "SUB:": Keyword.SUBSTITUTION,
+    "TIMEOUT": Keyword.TIMEOUT,
+    "JUMP BALL": Keyword.JUMP_BALL,
+}
+_TOKEN_PATTERN = re.compile("|".join(re.escape(token) for token in _TOKENS))
+_TOKEN_BITS = {token: int(keyword) for token, keyword in _TOKENS.items()}
+
+
+def _description_mask(description: str) -> int:
+    mask = 0
+    for token in _TOKEN_PATTERN.findall(description.upper()):
+        mask |= _TOKEN_BITS[token]
+    return mask
+
+
+def keyword_masks(descriptions: pd.Series) -> np.ndarray:
+    """Parses every description once into a bitmask of `Keyword` flags, 0 when there is no description."""
+    return np.fromiter(
+        (_description_mask(description) if isinstance(description, str) else 0 for description in descriptions),
+        dtype=np.uint32,
+        count=len(descriptions),
+    )
+
+
+def team_sides(
+    home_masks: np.ndarray, away_masks: np.ndarray, has_home: np.ndarray, has_away: np.ndarray
+) -> np.ndarray:
+    """
+    The side a play belongs to: the side with the only description, or when both sides have one, the side
+    that was stolen from or blocked.
+    """
+    home_stock = (home_masks & STOCK) != 0
+    away_stock = (away_masks & STOCK) != 0
+    both = has_home & has_away
+    return np.select(
+        [both & away_stock, both & home_stock, has_home & ~has_away, has_away & ~has_home],
+        [TeamSide.HOME, TeamSide.AWAY, TeamSide.HOME, TeamSide.AWAY],
+        default=TeamSide.UNKNOWN,
+    ).astype(np.int8)
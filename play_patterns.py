@@ -0,0 +1,192 @@
+import collections
+import enum
+import functools
+import operator
+from typing import Any, Iterable, Mapping
+
+import attrs
+import numpy as np
+import pandas as pd
+
+from instrumentation import profiled
+from play_keywords import Keyword
+from play_table import PlayTable
+
+_SCANNED_COLUMNS = [
+    "EVENTMSGTYPE",
+    "GAME_SECONDS",
+    "PLAYER1_ID",
+    "PLAYER1_TEAM_ID",
+    "HOME_KEYWORDS",
+    "AWAY_KEYWORDS",
+]
+PATTERN_COLUMNS = ["GAME_ID"] + _SCANNED_COLUMNS
+_REBOUND_FLOW_SECONDS = 7
+
+
+def _keyword_mask(keywords: Keyword | Iterable[Keyword]) -> int:
+    if isinstance(keywords, int):
+        return int(keywords)
+    return functools.reduce(operator.or_, (int(keyword) for keyword in keywords), 0)
+
+
+@attrs.frozen
+class PatternStep:
+    """
+    One step of a play sequence. `events` is the set of allowed EVENTMSGTYPE values (empty allows any),
+    `max_seconds` bounds the game time since the previous step, `keywords` are `Keyword` flags that must all
+    be in the play's descriptions, and `same_team` / `same_player` compare PLAYER1 with PLAYER1 of the first step.
+    """
+
+    events: frozenset[int] = frozenset()
+    max_seconds: int | None = None
+    keywords: int = attrs.field(default=0, converter=_keyword_mask)
+    same_team: bool = False
+    same_player: bool = False
+
+
+@attrs.frozen
+class PlayPattern:
+    """
+    A named sequence of steps. With `adjacent` every step must be the play right after the previous step,
+    otherwise unrelated plays may come in between as long as the step's time window is still open. Matches are
+    credited to PLAYER1 of step `attribute_to`.
+    """
+
+    name: str
+    steps: tuple[PatternStep, ...]
+    adjacent: bool = True
+    attribute_to: int = 0
+
+    @classmethod
+    def from_events(cls, name, init_events, follow_events, max_seconds, **options):
+        return cls(name, (PatternStep(frozenset(init_events)), PatternStep(frozenset(follow_events), max_seconds)), **options)
+
+
+@enum.unique
+class Plays(enum.IntEnum):
+    FG_MADE = 1
+    FG_MISSED = 2
+    OFFENSIVE_REBOUND = 4
+    TURNOVER = 5
+
+
+PLAY_NAMES = {play.value: play.name for play in Plays}
+
+# An offensive rebound followed within 7 seconds by a made or missed shot or a turnover
+OFFENSIVE_REBOUND_FLOW = PlayPattern.from_events(
+    Plays.OFFENSIVE_REBOUND.name,
+    (Plays.OFFENSIVE_REBOUND,),
+    (Plays.FG_MADE, Plays.FG_MISSED, Plays.TURNOVER),
+    _REBOUND_FLOW_SECONDS,
+)
+
+
+@attrs.frozen
+class _PartialMatch:
+    pattern: PlayPattern
+    step: int
+    plays: tuple[Any, ...]
+
+
+def _step_matches(step: PatternStep, play: Any, partial: _PartialMatch | None, keywords: int) -> bool:
+    if step.events and play.EVENTMSGTYPE not in step.events:
+        return False
+    if keywords & step.keywords != step.keywords:
+        return False
+    if partial is None:
+        return True
+    first_play, previous_play = partial.plays[0], partial.plays[-1]
+    if step.max_seconds is not None and play.GAME_SECONDS - previous_play.GAME_SECONDS > step.max_seconds:
+        return False
+    if step.same_team and play.PLAYER1_TEAM_ID != first_play.PLAYER1_TEAM_ID:
+        return False
+    if step.same_player and play.PLAYER1_ID != first_play.PLAYER1_ID:
+        return False
+    return True
+
+
+def _window_is_open(step: PatternStep, play: Any, partial: _PartialMatch) -> bool:
+    return step.max_seconds is None or play.GAME_SECONDS - partial.plays[-1].GAME_SECONDS <= step.max_seconds
+
+
+@attrs.define
+class PatternMatcher:
+    """
+    Matches many play patterns at once in a single pass over a game's plays. Patterns are indexed by the event
+    types of their first step, and every open partial match advances on each play, so adding a pattern does not
+    add another scan. Counts are kept per pattern, per player id, per matched event name.
+    """
+
+    patterns: tuple[PlayPattern, ...]
+    event_names: Mapping[int, str] = attrs.field(factory=dict)
+    _starts_by_event: dict[int, list[PlayPattern]] = attrs.field(init=False, factory=dict)
+    _starts_on_any_event: list[PlayPattern] = attrs.field(init=False, factory=list)
+
+    def __attrs_post_init__(self) -> None:
+        for pattern in self.patterns:
+            first_step = pattern.steps[0]
+            if not first_step.events:
+                self._starts_on_any_event.append(pattern)
+            for event in first_step.events:
+                self._starts_by_event.setdefault(event, []).append(pattern)
+
+    def new_counts(self) -> dict[str, collections.defaultdict]:
+        return {
+            pattern.name: collections.defaultdict(lambda: collections.defaultdict(int)) for pattern in self.patterns
+        }
+
+    def _record(self, counts: dict[str, collections.defaultdict], pattern: PlayPattern, plays: tuple[Any, ...]) -> None:
+        player_counts = counts[pattern.name][plays[pattern.attribute_to].PLAYER1_ID]
+        for play in plays:
+            player_counts[self.event_names.get(play.EVENTMSGTYPE, str(play.EVENTMSGTYPE))] += 1
+
+    def feed(
+        self, play: Any, active: list[_PartialMatch], counts: dict[str, collections.defaultdict]
+    ) -> list[_PartialMatch]:
+        """Advances every open partial match with one play and returns the partial matches still open."""
+        keywords = int(play.HOME_KEYWORDS | play.AWAY_KEYWORDS)
+        still_active = []
+        for partial in active:
+            step = partial.pattern.steps[partial.step]
+            if _step_matches(step, play, partial, keywords):
+                advanced = _PartialMatch(partial.pattern, partial.step + 1, partial.plays + (play,))
+                if advanced.step == len(partial.pattern.steps):
+                    self._record(counts, partial.pattern, advanced.plays)
+                else:
+                    still_active.append(advanced)
+            elif not partial.pattern.adjacent and _window_is_open(step, play, partial):
+                still_active.append(partial)
+
+        for pattern in self._starts_by_event.get(play.EVENTMSGTYPE, []) + self._starts_on_any_event:
+            if _step_matches(pattern.steps[0], play, None, keywords):
+                if len(pattern.steps) == 1:
+                    self._record(counts, pattern, (play,))
+                else:
+                    still_active.append(_PartialMatch(pattern, 1, (play,)))
+        return still_active
+
+    def feed_plays(
+        self, plays: pd.DataFrame, active: list[_PartialMatch], counts: dict[str, collections.defaultdict]
+    ) -> list[_PartialMatch]:
+        """Feeds the next plays of one game in order, e.g. the new plays of a game in progress."""
+        for play in plays[_SCANNED_COLUMNS].itertuples(index=False, name="Play"):
+            active = self.feed(play, active, counts)
+        return active
+
+    @profiled
+    def scan(
+        self, play_table: PlayTable, counts: dict[str, collections.defaultdict] | None = None
+    ) -> dict[str, collections.defaultdict]:
+        counts = counts if counts is not None else self.new_counts()
+        for _, game_plays in play_table.plays[PATTERN_COLUMNS].groupby("GAME_ID", sort=False, observed=True):
+            self.feed_plays(game_plays, [], counts)
+        return counts
+
+
+def counts_table(player_counts: Mapping[int, Mapping[str, int]]) -> pd.DataFrame:
+    """The counts of one pattern as a table with a PLAYER_ID column and a column per matched event name."""
+    table = pd.DataFrame.from_dict({player_id: dict(counts) for player_id, counts in player_counts.items()}, orient="index")
+    table = table.fillna(0).astype(np.int64).sort_index()
+    table.index = table.index.astype(np.int64)
+    return table.rename_axis("PLAYER_ID").reset_index()
@@ -0,0 +1,232 @@
+import argparse
+import functools
+import logging
+import operator
+import os
+from typing import Iterable
+
+import attrs
+import numpy as np
+import pandas as pd
+import pyarrow
+import pyarrow.compute
+import pyarrow.dataset
+import pyarrow.fs
+import pyarrow.ipc
+from nba_api.stats.endpoints import PlayByPlayV2
+
+from game_catalog import select_game_ids
+from game_fetcher import fetch_games
+from output_writers import OUTPUT_FORMATS, write_table
+from play_table import PLAYER_SLOTS, PlayTable
+
+_STORE_PATH = os.environ.get("NBA_PLAY_STORE_PATH", ".nba_plays")
+_PLAYS_FILE = "plays.arrow"
+_NAMES_FILE = "_names.arrow"  # Leading underscore keeps it out of the dataset discovery
+_PARTITIONING = pyarrow.dataset.partitioning(
+    pyarrow.schema(
+        [("season", pyarrow.string()), ("season_type", pyarrow.string()), ("game_id", pyarrow.string())]
+    ),
+    flavor="hive",
+)
+_PLAYER, _TEAM = "player", "team"
+
+
+def _isin(column: str, values: Iterable) -> pyarrow.compute.Expression:
+    return pyarrow.dataset.field(column).isin(list(values))
+
+
+def _any_slot_isin(column: str, values: Iterable) -> pyarrow.compute.Expression:
+    values = list(values)
+    return functools.reduce(operator.or_, [_isin(column.format(slot=slot), values) for slot in PLAYER_SLOTS])
+
+
+def _plays_table(plays: pd.DataFrame) -> pyarrow.Table:
+    table = pyarrow.Table.from_pandas(plays.drop(columns="GAME_ID"), preserve_index=False)
+    # A side without any description in the game would be typed null and clash with the other games
+    fields = [
+        pyarrow.field(field.name, pyarrow.string()) if pyarrow.types.is_null(field.type) else field
+        for field in table.schema
+    ]
+    return table.cast(pyarrow.schema(fields))
+
+
+def _names_table(plays: pd.DataFrame, play_table: PlayTable) -> pyarrow.Table:
+    """The names of the players and teams of one game of `play_table`."""
+    player_ids = set(np.unique(plays[[f"PLAYER{slot}_ID" for slot in PLAYER_SLOTS]]))
+    team_ids = set(np.unique(plays[[f"PLAYER{slot}_TEAM_ID" for slot in PLAYER_SLOTS]]))
+    names = [(_PLAYER, key, name) for key, name in play_table.player_names.items() if key in player_ids]
+    names += [(_TEAM, key, name) for key, name in play_table.team_abbreviations.items() if key in team_ids]
+    kinds, keys, values = zip(*names) if names else ((), (), ())
+    return pyarrow.table(
+        {
+            "KIND": pyarrow.array(kinds, pyarrow.string()),
+            "ID": pyarrow.array(keys, pyarrow.int64()),
+            "NAME": pyarrow.array(values, pyarrow.string()),
+        }
+    )
+
+
+def _write_ipc(table: pyarrow.Table, path: str) -> None:
+    # Uncompressed, so reads can map the file and use its buffers as they are
+    temporary_path = f"{path}.tmp"
+    with pyarrow.ipc.new_file(temporary_path, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temporary_path, path)
+
+
+@attrs.define
+class PlayStore:
+    """
+    Normalized play by play (`PlayTable` rows) on disk, one Arrow IPC file per game under hive-style
+    season=/season_type=/game_id= directories, with the game's player and team names next to it.
+    Reads memory map the files and only load the requested columns, and filters on the partitions skip
+    whole games without opening them.
+    """
+
+    root: str = _STORE_PATH
+    _filesystem: pyarrow.fs.FileSystem = attrs.field(
+        init=False, factory=lambda: pyarrow.fs.LocalFileSystem(use_mmap=True)
+    )
+
+    def partition(self, season: str, season_type: str, game_id: str) -> str:
+        return os.path.join(self.root, f"season={season}", f"season_type={season_type}", f"game_id={game_id}")
+
+    def has_game(self, season: str, season_type: str, game_id: str) -> bool:
+        return os.path.exists(os.path.join(self.partition(season, season_type, game_id), _PLAYS_FILE))
+
+    def seasons(self) -> list[tuple[str, str]]:
+        """The (season, season type) pairs with stored games."""
+        if not os.path.isdir(self.root):
+            return []
+        return [
+            (season.removeprefix("season="), season_type.removeprefix("season_type="))
+            for season in sorted(os.listdir(self.root))
+            for season_type in sorted(os.listdir(os.path.join(self.root, season)))
+        ]
+
+    def game_ids(self, season: str, season_type: str) -> list[str]:
+        """The stored games of a season and season type, from the partition directories alone."""
+        directory = os.path.dirname(self.partition(season, season_type, ""))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            name.removeprefix("game_id=")
+            for name in os.listdir(directory)
+            if os.path.exists(os.path.join(directory, name, _PLAYS_FILE))
+        )
+
+    def write(self, play_table: PlayTable, season: str, season_type: str) -> None:
+        """Stores every game of `play_table`, replacing the games already stored."""
+        for game_id, plays in play_table.plays.groupby("GAME_ID", sort=False, observed=True):
+            directory = self.partition(season, season_type, game_id)
+            os.makedirs(directory, exist_ok=True)
+            _write_ipc(_plays_table(plays), os.path.join(directory, _PLAYS_FILE))
+            _write_ipc(_names_table(plays, play_table), os.path.join(directory, _NAMES_FILE))
+
+    def _dataset(self) -> pyarrow.dataset.Dataset:
+        return pyarrow.dataset.dataset(
+            self.root, format="ipc", partitioning=_PARTITIONING, filesystem=self._filesystem
+        )
+
+    def read(
+        self,
+        columns: Iterable[str] | None = None,
+        seasons: Iterable[str] | None = None,
+        season_types: Iterable[str] | None = None,
+        game_ids: Iterable[str] | None = None,
+        event_types: Iterable[int] | None = None,
+        periods: Iterable[int] | None = None,
+        team_ids: Iterable[int] | None = None,
+        player_ids: Iterable[int] | None = None,
+        with_names: bool = True,
+    ) -> PlayTable:
+        """
+        Loads the plays matching every given filter as a `PlayTable` holding only `columns` (all by default)
+        and GAME_ID. Seasons, season types and games prune partitions; event types, periods, teams and players
+        (in any player slot) are applied while scanning, so the filter columns need not be in `columns`.
+        """
+        conditions = []
+        for column, values in (
+            ("season", seasons), ("season_type", season_types), ("game_id", game_ids),
+            ("EVENTMSGTYPE", event_types), ("PERIOD", periods),
+        ):
+            if values is not None:
+                conditions.append(_isin(column, values))
+        if team_ids is not None:
+            conditions.append(_any_slot_isin("PLAYER{slot}_TEAM_ID", team_ids))
+        if player_ids is not None:
+            conditions.append(_any_slot_isin("PLAYER{slot}_ID", player_ids))
+        row_filter = functools.reduce(operator.and_, conditions) if conditions else None
+
+        columns = [column for column in columns if column != "GAME_ID"] if columns is not None else None
+        dataset = self._dataset()
+        projection = None if columns is None else ["game_id"] + columns
+        table = dataset.to_table(columns=projection, filter=row_filter)
+        plays = table.to_pandas(split_blocks=True)
+        game_id = plays.pop("game_id").astype("category")
+        plays = plays.drop(columns=[column for column in ("season", "season_type") if column in plays])
+        plays.insert(0, "GAME_ID", game_id)
+
+        player_names, team_abbreviations = {}, {}
+        if with_names and len(plays):
+            names = self._read_names(table.column("game_id").unique().to_pylist(), dataset)
+            players, teams = names[names["KIND"] == _PLAYER], names[names["KIND"] == _TEAM]
+            player_names = dict(zip(players["ID"], players["NAME"]))
+            team_abbreviations = dict(zip(teams["ID"], teams["NAME"]))
+        return PlayTable(plays, player_names, team_abbreviations)
+
+    def _read_names(self, game_ids: list[str], dataset: pyarrow.dataset.Dataset) -> pd.DataFrame:
+        directories = {
+            os.path.dirname(fragment.path)
+            for fragment in dataset.get_fragments(filter=_isin("game_id", game_ids))
+        }
+        tables = [
+            pyarrow.ipc.open_file(self._filesystem.open_input_file(os.path.join(directory, _NAMES_FILE))).read_all()
+            for directory in sorted(directories)
+        ]
+        return pyarrow.concat_tables(tables).to_pandas()
+
+
+def ingest(season: str, season_type: str, store: PlayStore | None = None) -> int:
+    """Stores the play by play of every completed game of the season missing from the store."""
+    store = store or PlayStore()
+    game_ids = [
+        game_id
+        for game_id in select_game_ids(season, season_type, completed=True)
+        if not store.has_game(season, season_type, game_id)
+    ]
+    logging.info("Storing %s new games of %s %s", len(game_ids), season, season_type)
+    for _, play_by_play in fetch_games(PlayByPlayV2, game_ids, final=True):
+        store.write(PlayTable.from_endpoint(play_by_play), season, season_type)
+    return len(game_ids)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    parser = argparse.ArgumentParser(description="Store play by play locally and query it")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", help="store the completed games of a season")
+    ingest_parser.add_argument("season", help="e.g. 2022-23")
+    ingest_parser.add_argument("season_type", help="e.g. Playoffs")
+    query_parser = commands.add_parser("query", help="write the plays matching the filters")
+    query_parser.add_argument("--column", action="append", dest="columns", help="repeatable, defaults to all")
+    query_parser.add_argument("--season", action="append", dest="seasons")
+    query_parser.add_argument("--season-type", action="append", dest="season_types")
+    query_parser.add_argument("--game-id", action="append", dest="game_ids")
+    query_parser.add_argument("--event-type", action="append", dest="event_types", type=int)
+    query_parser.add_argument("--period", action="append", dest="periods", type=int)
+    query_parser.add_argument("--team-id", action="append", dest="team_ids", type=int)
+    query_parser.add_argument("--player-id", action="append", dest="player_ids", type=int)
+    query_parser.add_argument("--output", default="plays", help="file name without the extension")
+    query_parser.add_argument("--format", choices=OUTPUT_FORMATS)
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        ingest(args.season, args.season_type)
+    else:
+        play_table = PlayStore().read(
+            args.columns, args.seasons, args.season_types, args.game_ids, args.event_types, args.periods,
+            args.team_ids, args.player_ids, with_names=False,
+        )
+        write_table(play_table.plays, args.output, args.format)
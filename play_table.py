@@ -0,0 +1,137 @@
+from typing import Iterable
+
+import attrs
+import numpy as np
+import pandas as pd
+
+from instrumentation import profiled
+from play_keywords import keyword_masks, team_sides
+
+_PERIOD_SECONDS = 720
+_OVERTIME_SECONDS = 300
+_REGULATION_PERIODS = 4
+_PLAYER_PERSON_TYPES = [4, 5]  # Home and away players, as opposed to teams and officials
+PLAYER_SLOTS = (1, 2, 3)
+_DESCRIPTION_COLUMNS = ["HOMEDESCRIPTION", "VISITORDESCRIPTION"]
+
+
+def _clock_seconds(pctimestring: pd.Series) -> np.ndarray:
+    # Clocks repeat a lot, so only parse each distinct "M:SS" string once
+    codes, uniques = pd.factorize(pctimestring)
+    seconds = np.array(
+        [int(minutes) * 60 + int(seconds) for minutes, seconds in (clock.split(":") for clock in uniques)],
+        dtype=np.int16,
+    )
+    return seconds[codes]
+
+
+def _elapsed_seconds(period: np.ndarray, clock: np.ndarray) -> np.ndarray:
+    period = period.astype(np.int16)
+    in_regulation = period <= _REGULATION_PERIODS
+    period_start = np.where(
+        in_regulation,
+        (period - 1) * _PERIOD_SECONDS,
+        _REGULATION_PERIODS * _PERIOD_SECONDS + (period - _REGULATION_PERIODS - 1) * _OVERTIME_SECONDS,
+    )
+    period_length = np.where(in_regulation, _PERIOD_SECONDS, _OVERTIME_SECONDS)
+    return (period_start + period_length - clock).astype(np.int16)
+
+
+def _scores(play_by_play: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    codes, uniques = pd.factorize(play_by_play["SCORE"])
+    parsed = np.zeros((len(uniques), 2), dtype=np.int16)
+    for index, score in enumerate(uniques):
+        away, home = score.split(" - ")
+        parsed[index] = int(away), int(home)
+    # Carry the last known score forward within each game, 0 - 0 before the first basket
+    positions = pd.Series(np.where(codes >= 0, codes, np.nan), index=play_by_play.index)
+    positions = positions.groupby(play_by_play["GAME_ID"].to_numpy(), sort=False).ffill()
+    known = positions.notnull().to_numpy()
+    scores = np.zeros((len(play_by_play), 2), dtype=np.int16)
+    scores[known] = parsed[positions[known].astype(np.intp)]
+    return scores[:, 0], scores[:, 1]
+
+
+def _dictionary(play_by_play: pd.DataFrame, id_column: str, name_column: str) -> dict[int, str]:
+    return {
+        int(key): name
+        for key, name in zip(play_by_play[id_column].to_numpy(), play_by_play[name_column].to_numpy())
+        if isinstance(name, str) and key == key
+    }
+
+
+def player_appearances(plays: pd.DataFrame, slot: int) -> np.ndarray:
+    """Mask of the plays with a player, rather than a team, an official or nobody, in player `slot`."""
+    return plays[f"PERSON{slot}TYPE"].isin(_PLAYER_PERSON_TYPES).to_numpy() & (plays[f"PLAYER{slot}_ID"] != 0).to_numpy()
+
+
+@attrs.frozen
+class PlayTable:
+    """
+    Normalized play by play: one row per play with compact typed columns (int8 event types, int16 clock and
+    scores, int32 player/team ids) and the player and team names kept once in separate dictionaries.
+    CLOCK is the seconds remaining in the period and GAME_SECONDS the seconds elapsed since tip-off.
+    HOME_KEYWORDS / AWAY_KEYWORDS are the descriptions parsed once into `Keyword` bitmasks, and TEAM_SIDE the
+    `TeamSide` of the play.
+    """
+
+    plays: pd.DataFrame
+    player_names: dict[int, str]
+    team_abbreviations: dict[int, str]
+
+    @classmethod
+    @profiled
+    def from_play_by_play(cls, play_by_play: pd.DataFrame) -> "PlayTable":
+        play_by_play = play_by_play.reset_index(drop=True)
+        clock = _clock_seconds(play_by_play["PCTIMESTRING"])
+        period = play_by_play["PERIOD"].to_numpy(dtype=np.int8)
+        away_score, home_score = _scores(play_by_play)
+        columns = {
+            "GAME_ID": play_by_play["GAME_ID"].astype("category"),
+            "EVENTNUM": play_by_play["EVENTNUM"].to_numpy(dtype=np.int16),
+            "EVENTMSGTYPE": play_by_play["EVENTMSGTYPE"].to_numpy(dtype=np.int8),
+            "EVENTMSGACTIONTYPE": play_by_play["EVENTMSGACTIONTYPE"].to_numpy(dtype=np.uint8),
+            "PERIOD": period,
+            "CLOCK": clock,
+            "GAME_SECONDS": _elapsed_seconds(period, clock),
+            "SCORED": play_by_play["SCORE"].notnull().to_numpy(),
+            "AWAY_SCORE": away_score,
+            "HOME_SCORE": home_score,
+        }
+        for slot in PLAYER_SLOTS:
+            columns[f"PERSON{slot}TYPE"] = play_by_play[f"PERSON{slot}TYPE"].fillna(0).to_numpy(dtype=np.int8)
+            columns[f"PLAYER{slot}_ID"] = play_by_play[f"PLAYER{slot}_ID"].fillna(0).to_numpy(dtype=np.int32)
+            columns[f"PLAYER{slot}_TEAM_ID"] = play_by_play[f"PLAYER{slot}_TEAM_ID"].fillna(0).to_numpy(dtype=np.int32)
+        for column in _DESCRIPTION_COLUMNS:
+            columns[column] = play_by_play[column]
+        columns["HOME_KEYWORDS"] = keyword_masks(play_by_play["HOMEDESCRIPTION"])
+        columns["AWAY_KEYWORDS"] = keyword_masks(play_by_play["VISITORDESCRIPTION"])
+        columns["TEAM_SIDE"] = team_sides(
+            columns["HOME_KEYWORDS"],
+            columns["AWAY_KEYWORDS"],
+            play_by_play["HOMEDESCRIPTION"].notnull().to_numpy(),
+            play_by_play["VISITORDESCRIPTION"].notnull().to_numpy(),
+        )
+
+        player_names, team_abbreviations = {}, {}
+        for slot in PLAYER_SLOTS:
+            player_names.update(_dictionary(play_by_play, f"PLAYER{slot}_ID", f"PLAYER{slot}_NAME"))
+            team_abbreviations.update(
+                _dictionary(play_by_play, f"PLAYER{slot}_TEAM_ID", f"PLAYER{slot}_TEAM_ABBREVIATION")
+            )
+        return cls(pd.DataFrame(columns), player_names, team_abbreviations)
+
+    @classmethod
+    def from_endpoint(cls, endpoint) -> "PlayTable":
+        return cls.from_play_by_play(endpoint.get_data_frames()[0])
+
+    @classmethod
+    def concat(cls, tables: Iterable["PlayTable"]) -> "PlayTable":
+        tables = list(tables)
+        plays = pd.concat([table.plays for table in tables], ignore_index=True)
+        plays["GAME_ID"] = plays["GAME_ID"].astype("category")
+        player_names, team_abbreviations = {}, {}
+        for table in tables:
+            player_names.update(table.player_names)
+            team_abbreviations.update(table.team_abbreviations)
+        return cls(plays, player_names, team_abbreviations)
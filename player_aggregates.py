@@ -0,0 +1,278 @@
+import functools
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Mapping
+
+import attrs
+import pandas as pd
+
+from dimensions import Dimensions
+from game_catalog import get_catalog
+from play_patterns import OFFENSIVE_REBOUND_FLOW, PATTERN_COLUMNS, PLAY_NAMES, PatternMatcher
+from play_store import PlayStore
+from play_table import PlayTable
+from player_stats_engine import PLAYER_STATS_COLUMNS, compute_player_stats
+from value_stock_engine import VALUE_STOCK_COLUMNS, compute_value_stocks
+
+_AGGREGATES_PATH = os.environ.get("NBA_AGGREGATES_PATH", os.path.join(".nba_cache", "aggregates.sqlite3"))
+_QUERY_CACHE_SIZE = int(os.environ.get("NBA_QUERY_CACHE_SIZE", 256))
+_PLAYOFFS = "Playoffs"
+_PLAYOFF_ROUND_DIGIT = 7  # Playoff game ids read 004YY00RSG, R being the round
+_REBOUND_FLOW_COLUMNS = {
+    "OFFENSIVE_REBOUND": "REBOUND_FLOWS",
+    "FG_MADE": "REBOUND_FLOW_FG_MADE",
+    "FG_MISSED": "REBOUND_FLOW_FG_MISSED",
+    "TURNOVER": "REBOUND_FLOW_TURNOVERS",
+}
+_METRICS = ["STL", "BLK", "STOCKS", "VALUE_STOCK", "POINTS_OFF_STOCK"] + list(_REBOUND_FLOW_COLUMNS.values())
+_METRIC_TYPES = {metric: "REAL" if metric == "POINTS_OFF_STOCK" else "INTEGER" for metric in _METRICS}
+_COLUMNS = [
+    "GAME_ID", "PLAYER_ID", "SEASON", "SEASON_TYPE", "GAME_DATE", "PLAYOFF_ROUND", "TEAM_ID", "TEAM_ABBREVIATION",
+    "PLAYER_NAME",
+] + _METRICS
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS player_games (
+    game_id TEXT NOT NULL,
+    player_id INTEGER NOT NULL,
+    season TEXT NOT NULL,
+    season_type TEXT NOT NULL,
+    game_date TEXT,
+    playoff_round INTEGER,
+    team_id INTEGER NOT NULL,
+    team_abbreviation TEXT,
+    player_name TEXT,
+    {", ".join(f"{metric.lower()} {sql_type} NOT NULL" for metric, sql_type in _METRIC_TYPES.items())},
+    PRIMARY KEY (game_id, player_id)
+);
+CREATE INDEX IF NOT EXISTS player_games_player ON player_games (player_id, season, season_type);
+CREATE INDEX IF NOT EXISTS player_games_team ON player_games (team_abbreviation, game_date);
+CREATE INDEX IF NOT EXISTS player_games_season ON player_games (season, season_type, game_date);
+"""
+
+# Dimensions a query may roll up to, and the columns each one groups on
+_DIMENSIONS = {
+    "player": ["player_id", "player_name"],
+    "team": ["team_abbreviation"],
+    "season": ["season", "season_type"],
+    "round": ["playoff_round"],
+    "game": ["game_id", "game_date"],
+}
+_ORDER_BY = {"games_played"} | {metric.lower() for metric in _METRICS}
+
+
+def _playoff_round(game_id: str, season_type: str) -> int | None:
+    return int(game_id[_PLAYOFF_ROUND_DIGIT]) if season_type == _PLAYOFFS else None
+
+
+def game_aggregates(play_table: PlayTable, season: str, season_type: str, matcher: PatternMatcher) -> pd.DataFrame:
+    """
+    One row per game and player who appeared: the stocks, the value stocks and points off them, and the
+    offensive rebound flows the player started. The names stored with each row are the ones of that game.
+    """
+    dimensions = Dimensions.from_play_table(play_table)
+    player_stats = compute_player_stats(play_table)
+    player_stats["GAME_ID"] = player_stats["GAME_ID"].astype(str)
+    player_stats = dimensions.with_team_names(dimensions.with_player_names(player_stats, team_column=None))
+
+    value_stocks = compute_value_stocks(play_table, by_game=True).rename(columns={"ATTRIBUTED_PLAYER_ID": "PLAYER_ID"})
+    value_stocks["GAME_ID"] = value_stocks["GAME_ID"].astype(str)
+
+    pattern = matcher.patterns[0]
+    flows = []
+    for game_id, plays in play_table.plays.groupby("GAME_ID", sort=False, observed=True):
+        counts = matcher.new_counts()
+        matcher.feed_plays(plays, [], counts)
+        for player_id, event_counts in counts[pattern.name].items():
+            flows.append({"GAME_ID": str(game_id), "PLAYER_ID": int(player_id), **event_counts})
+    flows = pd.DataFrame(flows, columns=["GAME_ID", "PLAYER_ID"] + list(_REBOUND_FLOW_COLUMNS))
+    flows = flows.rename(columns=_REBOUND_FLOW_COLUMNS)
+
+    aggregates = player_stats.merge(value_stocks, on=["GAME_ID", "PLAYER_ID"], how="left")
+    aggregates = aggregates.merge(flows, on=["GAME_ID", "PLAYER_ID"], how="left")  # Team rebounds are left out
+    aggregates[_METRICS] = aggregates[_METRICS].fillna(0)
+    aggregates["SEASON"] = season
+    aggregates["SEASON_TYPE"] = season_type
+    aggregates["PLAYOFF_ROUND"] = [_playoff_round(game_id, season_type) for game_id in aggregates["GAME_ID"]]
+    return aggregates
+
+
+@attrs.frozen
+class AggregateQuery:
+    """
+    Filters over the per-game rows and the dimensions to roll them up to, e.g. `group_by=("player",)` for
+    season totals per player or `("team", "round")`. Dates are inclusive YYYY-MM-DD.
+    """
+
+    group_by: tuple[str, ...] = ("player",)
+    season: str | None = None
+    season_type: str | None = None
+    player_id: int | None = None
+    team: str | None = None
+    playoff_round: int | None = None
+    date_from: str | None = None
+    date_to: str | None = None
+    order_by: str = "value_stock"
+    limit: int | None = 100
+
+    def __attrs_post_init__(self) -> None:
+        unknown = [dimension for dimension in self.group_by if dimension not in _DIMENSIONS]
+        if unknown or not self.group_by:
+            raise ValueError(f"group_by must be some of {sorted(_DIMENSIONS)}, got {list(self.group_by)}")
+        if self.order_by not in _ORDER_BY:
+            raise ValueError(f"order_by must be one of {sorted(_ORDER_BY)}, got {self.order_by}")
+
+    @classmethod
+    def from_params(cls, params: Mapping[str, Any]) -> "AggregateQuery":
+        """Builds the query from string parameters, e.g. an HTTP query string, ignoring empty values."""
+        options = {key: value for key, value in params.items() if value not in (None, "")}
+        if "group_by" in options and isinstance(options["group_by"], str):
+            options["group_by"] = tuple(options["group_by"].split(","))
+        for key in ("player_id", "playoff_round", "limit"):
+            if key in options:
+                options[key] = int(options[key])
+        unknown = set(options) - set(attrs.fields_dict(cls))
+        if unknown:
+            raise ValueError(f"Unknown query parameters {sorted(unknown)}")
+        return cls(**options)
+
+    def to_sql(self) -> tuple[str, list[Any]]:
+        conditions, parameters = [], []
+        for condition, value in (
+            ("season = ?", self.season),
+            ("season_type = ?", self.season_type),
+            ("player_id = ?", self.player_id),
+            ("team_abbreviation = ?", self.team),
+            ("playoff_round = ?", self.playoff_round),
+            ("game_date >= ?", self.date_from),
+            ("game_date <= ?", self.date_to),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+
+        keys = [column for dimension in self.group_by for column in _DIMENSIONS[dimension]]
+        # A player's name can be spelled differently between games, so it is not a grouping key
+        selected = [
+            f"MAX({column}) AS {column.upper()}" if column == "player_name" else f"{column} AS {column.upper()}"
+            for column in keys
+        ]
+        selected += ["COUNT(DISTINCT game_id) AS GAMES_PLAYED"] + [f"SUM({metric.lower()}) AS {metric}" for metric in _METRICS]
+        grouped = [column for column in keys if column != "player_name"]
+        sql = f"SELECT {', '.join(selected)} FROM player_games"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        sql += f" GROUP BY {', '.join(grouped)} ORDER BY {self.order_by.upper()} DESC, {', '.join(grouped)}"
+        if self.limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(self.limit)
+        return sql, parameters
+
+
+@attrs.frozen
+class QueryResult:
+    columns: tuple[str, ...]
+    rows: tuple[tuple, ...]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.rows), columns=list(self.columns))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"columns": list(self.columns), "rows": [list(row) for row in self.rows]}
+
+
+@attrs.define
+class AggregateStore:
+    """
+    Per-game, per-player aggregates in an indexed sqlite database. Query results are kept in an in-process
+    LRU cache of `cache_size` entries, keyed by the database's data version so that rows written by another
+    process (e.g. a load while the query service runs) are never answered from the cache.
+    """
+
+    path: str = _AGGREGATES_PATH
+    cache_size: int = _QUERY_CACHE_SIZE
+    _connection: sqlite3.Connection = attrs.field(init=False)
+    _lock: threading.Lock = attrs.field(init=False, factory=threading.Lock)
+    _cached_query: Any = attrs.field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=60)
+        self._connection.executescript(_SCHEMA)
+        self._cached_query = functools.lru_cache(maxsize=self.cache_size)(self._query)
+
+    def upsert(self, aggregates: pd.DataFrame) -> None:
+        rows = aggregates[_COLUMNS].astype(object).where(aggregates[_COLUMNS].notnull(), None).itertuples(index=False)
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO player_games VALUES ({', '.join('?' * len(_COLUMNS))})", list(rows)
+            )
+        self._cached_query.cache_clear()
+
+    def game_ids(self, season: str, season_type: str) -> set[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT game_id FROM player_games WHERE season = ? AND season_type = ?", (season, season_type)
+            ).fetchall()
+        return {game_id for (game_id,) in rows}
+
+    def _data_version(self) -> int:
+        # Only changes with the commits of other connections, this one's writes clear the cache instead
+        with self._lock:
+            (data_version,) = self._connection.execute("PRAGMA data_version").fetchone()
+        return data_version
+
+    def _query(self, data_version: int, query: AggregateQuery) -> QueryResult:
+        sql, parameters = query.to_sql()
+        with self._lock:
+            cursor = self._connection.execute(sql, parameters)
+            rows = tuple(cursor.fetchall())
+        return QueryResult(tuple(column for column, *_ in cursor.description), rows)
+
+    def query(self, query: AggregateQuery) -> QueryResult:
+        return self._cached_query(self._data_version(), query)
+
+    def cache_info(self) -> Any:
+        return self._cached_query.cache_info()
+
+
+@functools.lru_cache(maxsize=None)
+def get_aggregate_store() -> AggregateStore:
+    return AggregateStore()
+
+
+def load_season(
+    season: str, season_type: str, play_store: PlayStore | None = None, store: AggregateStore | None = None
+) -> int:
+    """
+    Computes the aggregates of the games of the season in the play store that are not in the aggregate store
+    yet, reading only those games and only the columns the computations need.
+    """
+    play_store = play_store or PlayStore()
+    store = store or get_aggregate_store()
+    game_dates = {game.game_id: game.game_date for game in get_catalog().games(season=season, season_type=season_type)}
+    new_game_ids = sorted(set(play_store.game_ids(season, season_type)) - store.game_ids(season, season_type))
+    logging.info("Loading the aggregates of %s new games of %s %s", len(new_game_ids), season, season_type)
+    if not new_game_ids:
+        return 0
+
+    play_table = play_store.read(
+        sorted(set(VALUE_STOCK_COLUMNS) | set(PLAYER_STATS_COLUMNS) | set(PATTERN_COLUMNS)),
+        seasons=[season],
+        season_types=[season_type],
+        game_ids=new_game_ids,
+    )
+    matcher = PatternMatcher((OFFENSIVE_REBOUND_FLOW,), PLAY_NAMES)
+    aggregates = game_aggregates(play_table, season, season_type, matcher)
+    aggregates["GAME_DATE"] = aggregates["GAME_ID"].map(game_dates)
+    store.upsert(aggregates)
+    return len(new_game_ids)
+
+
+def query_aggregates(query: AggregateQuery, store: AggregateStore | None = None) -> QueryResult:
+    return (store or get_aggregate_store()).query(query)
+
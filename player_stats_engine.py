@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import profiled
+from play_keywords import Keyword
+from play_table import PLAYER_SLOTS, PlayTable, player_appearances
+
+_FIELD_GOAL_MISSED = 2
+_TURNOVER = 5
+_GAME_KEYS = ["GAME_ID", "PLAYER_ID", "TEAM_ID"]
+# The PlayTable columns the computation reads, e.g. to load only those from the play store
+PLAYER_STATS_COLUMNS = ["GAME_ID", "EVENTMSGTYPE", "HOME_KEYWORDS", "AWAY_KEYWORDS"] + [
+    column for slot in PLAYER_SLOTS for column in (f"PERSON{slot}TYPE", f"PLAYER{slot}_ID", f"PLAYER{slot}_TEAM_ID")
+]
+
+
+def _slot_rows(plays: pd.DataFrame, slot: int, steals: np.ndarray, blocks: np.ndarray) -> pd.DataFrame:
+    appeared = player_appearances(plays, slot)
+    return pd.DataFrame(
+        {
+            "GAME_ID": plays["GAME_ID"].to_numpy()[appeared],
+            "PLAYER_ID": plays[f"PLAYER{slot}_ID"].to_numpy()[appeared],
+            "TEAM_ID": plays[f"PLAYER{slot}_TEAM_ID"].to_numpy()[appeared],
+            "STL": steals[appeared] if slot == 2 else 0,
+            "BLK": blocks[appeared] if slot == 3 else 0,
+        }
+    )
+
+
+@profiled
+def compute_player_stats(play_table: PlayTable) -> pd.DataFrame:
+    """
+    Derives the box-score stocks from the play by play: one row per game and player who appears in any player
+    slot, with STL (PLAYER2 of a turnover described as a steal), BLK (PLAYER3 of a missed shot described as a
+    block) and STOCKS. Players and teams are keyed by id only, see `Dimensions` for their names.
+    """
+    plays = play_table.plays
+    keywords = (plays["HOME_KEYWORDS"] | plays["AWAY_KEYWORDS"]).to_numpy()
+    steals = ((plays["EVENTMSGTYPE"] == _TURNOVER).to_numpy() & ((keywords & Keyword.STEAL.value) != 0)).astype(np.int16)
+    blocks = ((plays["EVENTMSGTYPE"] == _FIELD_GOAL_MISSED).to_numpy() & ((keywords & Keyword.BLOCK.value) != 0)).astype(np.int16)
+
+    rows = pd.concat([_slot_rows(plays, slot, steals, blocks) for slot in PLAYER_SLOTS], ignore_index=True)
+    stats = rows.groupby(_GAME_KEYS, sort=False, observed=True).agg({"STL": "sum", "BLK": "sum"}).reset_index()
+    stats["STOCKS"] = stats["STL"] + stats["BLK"]
+    return stats
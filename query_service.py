@@ -0,0 +1,111 @@
+import argparse
+import http.server
+import json
+import logging
+import os
+import time
+import urllib.parse
+
+from output_writers import OUTPUT_FORMATS, write_table
+from play_store import PlayStore
+from player_aggregates import AggregateQuery, get_aggregate_store, load_season
+
+_HOST = os.environ.get("NBA_QUERY_HOST", "127.0.0.1")
+_PORT = int(os.environ.get("NBA_QUERY_PORT", 8765))
+_QUERY_PATH = "/players"
+_HEALTH_PATH = "/health"
+
+
+class QueryHandler(http.server.BaseHTTPRequestHandler):
+    """
+    GET /players?group_by=player,team&season=2022-23&season_type=Playoffs&order_by=stocks&limit=20 answers
+    with {"columns": [...], "rows": [...]}, every `AggregateQuery` field being a query parameter.
+    """
+
+    def _send_json(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == _HEALTH_PATH:
+            self._send_json(200, {"status": "ok", "cache": get_aggregate_store().cache_info()._asdict()})
+            return
+        if url.path != _QUERY_PATH:
+            self._send_json(404, {"error": f"unknown path {url.path}"})
+            return
+
+        try:
+            query = AggregateQuery.from_params(dict(urllib.parse.parse_qsl(url.query)))
+        except (TypeError, ValueError) as error:
+            self._send_json(400, {"error": str(error)})
+            return
+        start = time.perf_counter()
+        result = get_aggregate_store().query(query)
+        body = result.to_dict()
+        body["milliseconds"] = round((time.perf_counter() - start) * 1000, 3)
+        self._send_json(200, body)
+
+    def log_message(self, format: str, *args) -> None:
+        logging.info("%s - %s", self.address_string(), format % args)
+
+
+def serve(host: str = _HOST, port: int = _PORT) -> None:
+    server = http.server.ThreadingHTTPServer((host, port), QueryHandler)
+    logging.info("Serving player aggregates on http://%s:%s%s", host, port, _QUERY_PATH)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    parser = argparse.ArgumentParser(description="Query the per-game player aggregates")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load_parser = commands.add_parser("load", help="aggregate the games of the play store not loaded yet")
+    load_parser.add_argument("--season", help="defaults to every season in the play store")
+    load_parser.add_argument("--season-type")
+    serve_parser = commands.add_parser("serve", help="answer queries over HTTP")
+    serve_parser.add_argument("--host", default=_HOST)
+    serve_parser.add_argument("--port", type=int, default=_PORT)
+    query_parser = commands.add_parser("query", help="run one query")
+    query_parser.add_argument("--group-by", default="player", help="comma separated: player, team, season, round, game")
+    query_parser.add_argument("--season")
+    query_parser.add_argument("--season-type")
+    query_parser.add_argument("--player-id")
+    query_parser.add_argument("--team")
+    query_parser.add_argument("--playoff-round")
+    query_parser.add_argument("--date-from")
+    query_parser.add_argument("--date-to")
+    query_parser.add_argument("--order-by", default="value_stock")
+    query_parser.add_argument("--limit", default="100")
+    query_parser.add_argument("--output", help="write to this file name instead of printing")
+    query_parser.add_argument("--format", choices=OUTPUT_FORMATS)
+    args = parser.parse_args()
+
+    if args.command == "load":
+        for season, season_type in PlayStore().seasons():
+            if args.season in (None, season) and args.season_type in (None, season_type):
+                load_season(season, season_type)
+    elif args.command == "serve":
+        serve(args.host, args.port)
+    else:
+        options = vars(args)
+        output, output_format = options.pop("output"), options.pop("format")
+        del options["command"]
+        try:
+            query = AggregateQuery.from_params(options)
+        except ValueError as error:
+            parser.error(str(error))
+        result = get_aggregate_store().query(query).to_frame()
+        if output:
+            write_table(result, output, output_format)
+        else:
+            print(result.to_string(index=False))
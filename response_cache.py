@@ -0,0 +1,213 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable
+
+import attrs
+from nba_api.stats.library.http import NBAStatsHTTP, NBAStatsResponse
+
+from instrumentation import get_recorder
+
+_CACHE_PATH = os.environ.get("NBA_CACHE_PATH", os.path.join(".nba_cache", "responses.sqlite3"))
+_SCHEDULE_TTL_SECONDS = float(os.environ.get("NBA_CACHE_SCHEDULE_TTL", 6 * 60 * 60))
+_UNFINISHED_GAME_TTL_SECONDS = float(os.environ.get("NBA_CACHE_UNFINISHED_GAME_TTL", 5 * 60))
+_MAX_CACHE_BYTES = int(os.environ.get("NBA_CACHE_MAX_BYTES", 2 * 1024**3))
+_ACCESS_BATCH_SIZE = 256
+_SCHEDULE_ENDPOINTS = frozenset({"leaguegamefinder", "leaguegamelog"})
+_COMPRESSION_LEVEL = 6
+_HTTP_OK = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+class StatsRequestError(Exception):
+    def __init__(self, endpoint: str, status_code: int | None):
+        super().__init__(f"{endpoint} request failed with status code {status_code}")
+        self.endpoint = endpoint
+        self.status_code = status_code
+
+
+def _cache_key(endpoint: str, parameters: dict[str, Any]) -> str:
+    return f"{endpoint}?{json.dumps(parameters, sort_keys=True, default=str)}"
+
+
+@attrs.define
+class ResponseCache:
+    """
+    Compressed on-disk store of raw stats.nba.com payloads, keyed by endpoint and request parameters.
+    Game endpoints (play by play, box scores) of final games never expire since finished games never change,
+    those of games that may still be in progress expire after `unfinished_game_ttl` seconds, schedule endpoints
+    after `schedule_ttl` seconds, and the least recently read payloads are evicted once the cache grows past
+    `max_bytes`. Reads are recorded in batches rather than with a write per hit.
+    """
+
+    path: str = _CACHE_PATH
+    schedule_ttl: float = _SCHEDULE_TTL_SECONDS
+    unfinished_game_ttl: float = _UNFINISHED_GAME_TTL_SECONDS
+    max_bytes: int = _MAX_CACHE_BYTES
+    _connection: sqlite3.Connection = attrs.field(init=False)
+    _lock: threading.Lock = attrs.field(init=False, factory=threading.Lock)
+    _accessed: dict[str, float] = attrs.field(init=False, factory=dict)
+
+    def __attrs_post_init__(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=60)
+        # Readers do not wait on writers in WAL mode, e.g. backfill workers sharing the cache file
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def get(self, endpoint: str, parameters: dict[str, Any]) -> str | None:
+        key = _cache_key(endpoint, parameters)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT payload, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                with self._connection:
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= _ACCESS_BATCH_SIZE:
+                with self._connection:
+                    self._write_accessed()
+        return zlib.decompress(payload).decode("utf-8")
+
+    def put(self, endpoint: str, parameters: dict[str, Any], response: str, final: bool = False) -> None:
+        """
+        Stores a payload. Game payloads are kept for good only when `final` says the game is over, otherwise
+        they expire after `unfinished_game_ttl` seconds, so a game still in progress is fetched again.
+        """
+        payload = zlib.compress(response.encode("utf-8"), _COMPRESSION_LEVEL)
+        now = time.time()
+        if endpoint.lower() in _SCHEDULE_ENDPOINTS:
+            expires_at = now + self.schedule_ttl
+        else:
+            expires_at = None if final else now + self.unfinished_game_ttl
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (_cache_key(endpoint, parameters), endpoint, payload, len(payload), expires_at, now),
+            )
+            self._write_accessed()
+            self._evict()
+
+    def flush(self) -> None:
+        """Writes the reads recorded since the last batch, e.g. before a long-running process exits."""
+        with self._lock, self._connection:
+            self._write_accessed()
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def _write_accessed(self) -> None:
+        self._connection.executemany(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def _evict(self) -> None:
+        (total_bytes,) = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total_bytes <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if total_bytes <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total_bytes -= size
+            evicted += 1
+        logging.info("Evicted %s cached responses to stay under %s bytes", evicted, self.max_bytes)
+
+
+@functools.lru_cache(maxsize=None)
+def get_default_cache() -> ResponseCache:
+    cache = ResponseCache()
+    atexit.register(cache.flush)
+    return cache
+
+
+def _request(endpoint: Any) -> NBAStatsResponse:
+    response = NBAStatsHTTP().send_api_request(
+        endpoint=endpoint.endpoint,
+        parameters=endpoint.parameters,
+        proxy=endpoint.proxy,
+        headers=endpoint.headers,
+        timeout=endpoint.timeout,
+    )
+    if response._status_code != _HTTP_OK or not response.valid_json():
+        raise StatsRequestError(endpoint.endpoint, response._status_code)
+    return response
+
+
+def _record(endpoint_name: str, game_id: str | None, metric: str, value: float) -> None:
+    # Per-game metrics are keyed by the game id, other requests (e.g. the game list) are kept as samples
+    if game_id is None:
+        get_recorder().observe(f"{endpoint_name}_{metric}", value)
+    else:
+        get_recorder().record_game(game_id, metric, value)
+
+
+def fetch_endpoint(
+    endpoint_cls: type,
+    cache: ResponseCache | None = None,
+    before_request: Callable[[], None] | None = None,
+    use_cache: bool = True,
+    final: bool = False,
+    **parameters: Any,
+) -> Any:
+    """
+    Drop-in replacement for `endpoint_cls(**parameters)` that serves the response from the on-disk cache
+    when possible and only goes to stats.nba.com on a miss, calling `before_request` (e.g. a rate limiter)
+    right before the network request. Without `use_cache` the cache is neither read nor written, e.g. for the
+    play by play of a game in progress. Game responses are only cached for good when `final` says the game is
+    over.
+    """
+    cache = cache if cache is not None else get_default_cache()
+    endpoint = endpoint_cls(get_request=False, **parameters)
+    game_id = parameters.get("game_id")
+    payload = cache.get(endpoint.endpoint, endpoint.parameters) if use_cache else None
+    if payload is None:
+        get_recorder().count("cache_misses")
+        if before_request is not None:
+            before_request()
+        start = time.perf_counter()
+        endpoint.nba_response = _request(endpoint)
+        _record(endpoint_cls.__name__, game_id, "fetch_seconds", time.perf_counter() - start)
+        response = endpoint.nba_response.get_response()
+        _record(endpoint_cls.__name__, game_id, "bytes_received", len(response))
+        if use_cache:
+            cache.put(endpoint.endpoint, endpoint.parameters, response, final)
+    else:
+        get_recorder().count("cache_hits")
+        endpoint.nba_response = NBAStatsResponse(response=payload, status_code=_HTTP_OK, url=None)
+
+    start = time.perf_counter()
+    endpoint.load_response()
+    _record(endpoint_cls.__name__, game_id, "parse_seconds", time.perf_counter() - start)
+    _record(endpoint_cls.__name__, game_id, "rows", sum(len(data_set.data["data"]) for data_set in endpoint.data_sets))
+    return endpoint
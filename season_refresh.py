@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import random
+import shutil
+from typing import Iterable
+
+import attrs
+import pandas as pd
+from nba_api.stats.endpoints import BoxScoreTraditionalV2, PlayByPlayV2
+
+from dimensions import Dimensions, categorical_keys
+from game_catalog import select_game_ids
+from game_fetcher import fetch_games
+from instrumentation import get_recorder
+from play_table import PlayTable
+from player_stats_engine import compute_player_stats
+from value_stock_engine import compute_value_stocks
+
+_STORE_PATH = os.environ.get("NBA_PARTIALS_PATH", ".nba_partials")
+_MANIFEST = "manifest.json"
+PLAYER_STATS = "player_stats"
+VALUE_STOCKS = "value_stocks"
+DIMENSIONS = "dimensions"
+SEASON_KEYS = ["SEASON", "SEASON_TYPE"]
+PLAYER_STATS_KEYS = ["PLAYER_ID"] + SEASON_KEYS
+_VALUE_STOCKS_KEYS = ["ATTRIBUTED_PLAYER_ID"]
+
+
+@attrs.frozen
+class SeasonTotals:
+    """
+    Season totals keyed by player id; `dimensions` holds the player and team names to join when writing them.
+    """
+
+    player_stats: pd.DataFrame
+    value_stocks: pd.DataFrame
+    dimensions: Dimensions
+
+
+def get_season_game_ids(season: str, season_type: str) -> list[str]:
+    # Games still in progress are left out so they are not frozen into the manifest half played
+    return select_game_ids(season, season_type, completed=True)
+
+
+def _played(box_score: pd.DataFrame) -> pd.DataFrame:
+    data = box_score[box_score["MIN"].notnull()].copy()  # Removes all players that didn't play
+    data["STOCKS"] = data[["STL", "BLK"]].sum(axis=1)  # Calculates the stocks
+    return data
+
+
+def game_player_stats(player_stats: pd.DataFrame, season: str, season_type: str) -> pd.DataFrame:
+    """Games played and stocks per player, from the per-game rows of `compute_player_stats`."""
+    data = categorical_keys(player_stats.assign(SEASON=season, SEASON_TYPE=season_type), SEASON_KEYS)
+    grouped = data.groupby(PLAYER_STATS_KEYS, observed=True)
+    return grouped.agg({"GAME_ID": "count", "STOCKS": "sum"}).reset_index()
+
+
+def merge_player_stats(partials: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    player_stats = categorical_keys(pd.concat(partials, ignore_index=True), SEASON_KEYS)
+    grouped = player_stats.groupby(PLAYER_STATS_KEYS, observed=True)
+    return grouped.agg({"GAME_ID": "sum", "STOCKS": "sum"}).reset_index()
+
+
+def merge_value_stocks(partials: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    value_stocks = pd.concat(partials, ignore_index=True)
+    return value_stocks.groupby(_VALUE_STOCKS_KEYS).agg({"VALUE_STOCK": "sum", "POINTS_OFF_STOCK": "sum"}).reset_index()
+
+
+@attrs.define
+class SeasonStore:
+    """
+    Per-game partial aggregates of one season and season type, the running season totals, and a manifest of
+    the GAME_IDs already folded into those totals.
+    """
+
+    season: str
+    season_type: str
+    root: str = _STORE_PATH
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.root, self.season, self.season_type)
+
+    def _partial_path(self, kind: str, game_id: str) -> str:
+        return os.path.join(self.path, kind, f"{game_id}.parquet")
+
+    def _totals_path(self, kind: str) -> str:
+        # The dimensions are a directory holding their players and teams tables
+        return os.path.join(self.path, f"{kind}_totals" if kind == DIMENSIONS else f"{kind}_totals.parquet")
+
+    def processed_game_ids(self) -> set[str]:
+        manifest_path = os.path.join(self.path, _MANIFEST)
+        if not os.path.exists(manifest_path):
+            return set()
+        with open(manifest_path) as manifest:
+            return set(json.load(manifest))
+
+    def clear(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def save_game(self, game_id: str, player_stats: pd.DataFrame, value_stocks: pd.DataFrame) -> None:
+        for kind, partial in ((PLAYER_STATS, player_stats), (VALUE_STOCKS, value_stocks)):
+            os.makedirs(os.path.dirname(self._partial_path(kind, game_id)), exist_ok=True)
+            partial.to_parquet(self._partial_path(kind, game_id), index=False)
+
+    def load_totals(self) -> SeasonTotals | None:
+        # Totals saved before the dimensions existed are keyed by names, and earlier pickled totals are not read
+        # back, so either way the season is rebuilt
+        if not os.path.exists(self._totals_path(DIMENSIONS)):
+            return None
+        return SeasonTotals(
+            pd.read_parquet(self._totals_path(PLAYER_STATS)),
+            pd.read_parquet(self._totals_path(VALUE_STOCKS)),
+            Dimensions.read(self._totals_path(DIMENSIONS)),
+        )
+
+    def save_totals(self, totals: SeasonTotals, game_ids: Iterable[str]) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        totals.player_stats.to_parquet(self._totals_path(PLAYER_STATS), index=False)
+        totals.value_stocks.to_parquet(self._totals_path(VALUE_STOCKS), index=False)
+        totals.dimensions.write(self._totals_path(DIMENSIONS))
+        # The manifest is written last so an interrupted run never lists games missing from the totals
+        manifest_path = os.path.join(self.path, _MANIFEST)
+        with open(f"{manifest_path}.tmp", "w") as manifest:
+            json.dump(sorted(game_ids), manifest)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+
+def _empty_totals() -> SeasonTotals:
+    return SeasonTotals(
+        pd.DataFrame(columns=PLAYER_STATS_KEYS + ["GAME_ID", "STOCKS"]),
+        pd.DataFrame(columns=_VALUE_STOCKS_KEYS + ["VALUE_STOCK", "POINTS_OFF_STOCK"]),
+        Dimensions.empty(),
+    )
+
+
+def _process_games(store: SeasonStore, game_ids: list[str]) -> SeasonTotals:
+    recorder = get_recorder()
+    play_tables = {}
+    with recorder.stage("play_by_play"):
+        for game_id, play_by_play in fetch_games(PlayByPlayV2, game_ids, final=True):
+            with recorder.time_game(game_id, "transform_seconds"):
+                play_tables[game_id] = PlayTable.from_endpoint(play_by_play)
+    # Games finish downloading in any order, game id order keeps the players' latest teams deterministic
+    play_table = PlayTable.concat(play_tables[game_id] for game_id in sorted(play_tables))
+
+    # The box-score stocks come from the same play by play, so every game costs a single request
+    with recorder.stage("player_stats"):
+        player_stats_by_game = compute_player_stats(play_table)
+        player_stats = {
+            game_id: game_player_stats(partial, store.season, store.season_type)
+            for game_id, partial in player_stats_by_game.groupby("GAME_ID", sort=False)
+        }
+    no_player_stats = game_player_stats(player_stats_by_game.iloc[0:0], store.season, store.season_type)
+    with recorder.stage("value_stocks"):
+        value_stocks_by_game = compute_value_stocks(play_table, by_game=True)
+    value_stocks = {
+        game_id: partial.drop(columns="GAME_ID").reset_index(drop=True)
+        for game_id, partial in value_stocks_by_game.groupby("GAME_ID", observed=True)
+    }
+    no_value_stocks = value_stocks_by_game.drop(columns="GAME_ID").iloc[0:0]
+    for game_id in game_ids:
+        with recorder.time_game(game_id, "write_seconds"):
+            store.save_game(
+                game_id, player_stats.get(game_id, no_player_stats), value_stocks.get(game_id, no_value_stocks)
+            )
+    return SeasonTotals(
+        merge_player_stats(list(player_stats.values()) or [no_player_stats]),
+        merge_value_stocks([value_stocks_by_game.drop(columns="GAME_ID")]),
+        Dimensions.from_play_table(play_table),
+    )
+
+
+def refresh_season(
+    season: str, season_type: str, full_rebuild: bool = False, store: SeasonStore | None = None
+) -> SeasonTotals:
+    """
+    Brings the season totals up to date by processing only the games missing from the store's manifest, or
+    every game of the season when `full_rebuild` is set. Both paths produce the same totals.
+    """
+    store = store if store is not None else SeasonStore(season, season_type)
+    if full_rebuild or (store.processed_game_ids() and store.load_totals() is None):
+        store.clear()
+
+    processed_game_ids = store.processed_game_ids()
+    with get_recorder().stage("game_list"):
+        season_game_ids = get_season_game_ids(season, season_type)
+    new_game_ids = [game_id for game_id in season_game_ids if game_id not in processed_game_ids]
+    totals = store.load_totals()
+    logging.info("Processing %s new games of %s %s", len(new_game_ids), season, season_type)
+    if not new_game_ids:
+        return totals if totals is not None else _empty_totals()
+
+    new_totals = _process_games(store, new_game_ids)
+    with get_recorder().stage("merge_totals"):
+        if totals is not None:
+            new_totals = SeasonTotals(
+                merge_player_stats([totals.player_stats, new_totals.player_stats]),
+                merge_value_stocks([totals.value_stocks, new_totals.value_stocks]),
+                Dimensions.concat([totals.dimensions, new_totals.dimensions]),
+            )
+        store.save_totals(new_totals, processed_game_ids.union(new_game_ids))
+    return new_totals
+
+
+def reconcile_player_stats(season: str, season_type: str, sample_size: int = 20, seed: int = 0) -> pd.DataFrame:
+    """
+    Checks the stocks and appearances derived from the play by play against BoxScoreTraditionalV2 on a random
+    sample of games, and returns one row per game and player where the two disagree.
+    """
+    season_game_ids = get_season_game_ids(season, season_type)
+    game_ids = random.Random(seed).sample(season_game_ids, min(sample_size, len(season_game_ids)))
+    box_scores = pd.concat(
+        [_played(box_score.get_data_frames()[0]) for _, box_score in fetch_games(BoxScoreTraditionalV2, game_ids, final=True)],
+        ignore_index=True,
+    )
+    play_tables = [PlayTable.from_endpoint(play_by_play) for _, play_by_play in fetch_games(PlayByPlayV2, game_ids, final=True)]
+    derived = compute_player_stats(PlayTable.concat(play_tables)).astype({"PLAYER_ID": "int64"})
+
+    compared = pd.merge(
+        box_scores[["GAME_ID", "PLAYER_ID", "PLAYER_NAME", "STL", "BLK", "STOCKS"]],
+        derived[["GAME_ID", "PLAYER_ID", "STL", "BLK", "STOCKS"]],
+        on=["GAME_ID", "PLAYER_ID"],
+        how="outer",
+        suffixes=("_BOX_SCORE", "_PLAY_BY_PLAY"),
+        indicator="FOUND_IN",
+    )
+    mismatches = compared[
+        (compared["FOUND_IN"] != "both")
+        | (compared["STL_BOX_SCORE"] != compared["STL_PLAY_BY_PLAY"])
+        | (compared["BLK_BOX_SCORE"] != compared["BLK_PLAY_BY_PLAY"])
+    ]
+    logging.info(
+        "Reconciled %s games: %s of %s player rows differ", len(game_ids), len(mismatches), len(compared)
+    )
+    return mismatches.reset_index(drop=True)
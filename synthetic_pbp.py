@@ -0,0 +1,334 @@
+import collections
+import random
+from typing import Iterator
+
+import attrs
+import pandas as pd
+
+_FIRST_TEAM_ID = 1610612737
+_TEAM_ABBREVIATIONS = (
+    "ATL BOS CLE NOP CHI DAL DEN GSW HOU LAC LAL MIA MIL MIN BKN NYK ORL IND PHI PHX POR SAC SAS OKC TOR UTA MEM "
+    "WAS DET CHA"
+).split()
+_ROSTER_SIZE = 13
+_ACTIVE_PLAYERS = 10
+_FIRST_PLAYER_ID = 200000
+_GAMES_PER_SEASON = 1230
+_PERIOD_SECONDS = 720
+_OVERTIME_SECONDS = 300
+_OVERTIME_PROBABILITY = 0.06
+_TURNOVER_PROBABILITY = 0.13
+_SHOOTING_FOUL_PROBABILITY = 0.09
+_STEAL_PROBABILITY = 0.5
+_BLOCK_PROBABILITY = 0.07
+_THREE_POINT_PROBABILITY = 0.38
+_FIELD_GOAL_PROBABILITY = 0.47
+_FREE_THROW_PROBABILITY = 0.77
+_OFFENSIVE_REBOUND_PROBABILITY = 0.25
+_TEAM_REBOUND_PROBABILITY = 0.08
+_SUBSTITUTION_PROBABILITY = 0.08
+_TIMEOUT_PROBABILITY = 0.03
+_TURNOVER_KINDS = ("Bad Pass", "Lost Ball", "Traveling", "Out of Bounds - Bad Pass Turnover", "Offensive Foul")
+_SHOT_KINDS = ("Jump Shot", "Driving Layup", "Pullup Jump Shot", "Cutting Dunk Shot", "Floating Jump shot")
+
+_HOME_PLAYER, _AWAY_PLAYER, _HOME_TEAM, _AWAY_TEAM = 4, 5, 2, 3
+
+PLAY_BY_PLAY_COLUMNS = (
+    "GAME_ID EVENTNUM EVENTMSGTYPE EVENTMSGACTIONTYPE PERIOD WCTIMESTRING PCTIMESTRING HOMEDESCRIPTION "
+    "NEUTRALDESCRIPTION VISITORDESCRIPTION SCORE SCOREMARGIN "
+    "PERSON1TYPE PLAYER1_ID PLAYER1_NAME PLAYER1_TEAM_ID PLAYER1_TEAM_CITY PLAYER1_TEAM_NICKNAME PLAYER1_TEAM_ABBREVIATION "
+    "PERSON2TYPE PLAYER2_ID PLAYER2_NAME PLAYER2_TEAM_ID PLAYER2_TEAM_CITY PLAYER2_TEAM_NICKNAME PLAYER2_TEAM_ABBREVIATION "
+    "PERSON3TYPE PLAYER3_ID PLAYER3_NAME PLAYER3_TEAM_ID PLAYER3_TEAM_CITY PLAYER3_TEAM_NICKNAME PLAYER3_TEAM_ABBREVIATION "
+    "VIDEO_AVAILABLE_FLAG"
+).split()
+BOX_SCORE_COLUMNS = (
+    "GAME_ID TEAM_ID TEAM_ABBREVIATION TEAM_CITY PLAYER_ID PLAYER_NAME NICKNAME START_POSITION COMMENT MIN "
+    "REB STL BLK PTS"
+).split()
+
+
+@attrs.frozen
+class SyntheticTeam:
+    team_id: int
+    abbreviation: str
+    players: tuple[tuple[int, str], ...]
+
+    @classmethod
+    def from_index(cls, index):
+        players = tuple(
+            (_FIRST_PLAYER_ID + index * _ROSTER_SIZE + slot, f"Player{index:02d} Number{slot:02d}")
+            for slot in range(_ROSTER_SIZE)
+        )
+        return cls(_FIRST_TEAM_ID + index, _TEAM_ABBREVIATIONS[index], players)
+
+
+@attrs.frozen
+class SyntheticGame:
+    game_id: str
+    season: str
+    season_type: str
+    game_date: str
+    home: SyntheticTeam
+    away: SyntheticTeam
+    play_by_play: pd.DataFrame
+    box_score: pd.DataFrame
+
+
+_TEAMS = tuple(SyntheticTeam.from_index(index) for index in range(len(_TEAM_ABBREVIATIONS)))
+
+
+def _clock(seconds: int) -> str:
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class _GameWriter:
+    def __init__(self, game_id: str, home: SyntheticTeam, away: SyntheticTeam, rng: random.Random):
+        self.game_id = game_id
+        self.teams = {True: home, False: away}
+        self.rng = rng
+        self.rows = []
+        self.score = {True: 0, False: 0}
+        self.stats = {}
+        self.period = 1
+        self.clock = _PERIOD_SECONDS
+        self.active = {
+            is_home: list(team.players[:_ACTIVE_PLAYERS // 2]) for is_home, team in self.teams.items()
+        }
+        for is_home in self.teams:
+            for player in self.active[is_home]:
+                self._player_stats(player, is_home)
+
+    def _player_stats(self, player: tuple[int, str], is_home: bool) -> collections.Counter:
+        return self.stats.setdefault((player, is_home), collections.Counter())
+
+    def _person(self, player: tuple[int, str] | None, is_home: bool, team_event: bool = False) -> list:
+        team = self.teams[is_home]
+        if team_event:
+            return [_HOME_TEAM if is_home else _AWAY_TEAM, team.team_id, None, None, None, None, None]
+        if player is None:
+            return [0, 0, None, None, None, None, None]
+        person_type = _HOME_PLAYER if is_home else _AWAY_PLAYER
+        return [person_type, player[0], player[1], team.team_id, "City", "Nickname", team.abbreviation]
+
+    def _emit(
+        self,
+        event: int,
+        action: int,
+        home_description: str | None = None,
+        away_description: str | None = None,
+        neutral_description: str | None = None,
+        scored: bool = False,
+        person1: list | None = None,
+        person2: list | None = None,
+        person3: list | None = None,
+    ) -> None:
+        score, margin = None, None
+        if scored:
+            score = f"{self.score[False]} - {self.score[True]}"
+            difference = self.score[True] - self.score[False]
+            margin = "TIE" if difference == 0 else str(difference)
+        empty = [0, 0, None, None, None, None, None]
+        self.rows.append(
+            [self.game_id, len(self.rows) + 1, event, action, self.period, "7:30 PM", _clock(self.clock)]
+            + [home_description, neutral_description, away_description, score, margin]
+            + (person1 or empty)
+            + (person2 or empty)
+            + (person3 or empty)
+            + [1]
+        )
+
+    def _describe(self, is_home: bool, description: str, other: str | None = None) -> tuple[str | None, str | None]:
+        return (description, other) if is_home else (other, description)
+
+    def _tick(self, low: int, high: int) -> bool:
+        self.clock -= self.rng.randint(low, high)
+        if self.clock <= 0:
+            self.clock = 0
+            return False
+        return True
+
+    def _pick(self, is_home: bool) -> tuple[int, str]:
+        return self.rng.choice(self.active[is_home])
+
+    def _substitution(self, is_home: bool) -> None:
+        bench = [player for player in self.teams[is_home].players if player not in self.active[is_home]]
+        player_in = self.rng.choice(bench)
+        slot = self.rng.randrange(len(self.active[is_home]))
+        player_out = self.active[is_home][slot]
+        self.active[is_home][slot] = player_in
+        self._player_stats(player_in, is_home)
+        home, away = self._describe(is_home, f"SUB: {player_in[1]} FOR {player_out[1]}")
+        self._emit(8, 0, home, away, person1=self._person(player_out, is_home), person2=self._person(player_in, is_home))
+
+    def _free_throws(self, is_home: bool, shooter: tuple[int, str], attempts: int) -> bool:
+        made_last = False
+        for attempt in range(1, attempts + 1):
+            made_last = self.rng.random() < _FREE_THROW_PROBABILITY
+            stats = self._player_stats(shooter, is_home)
+            if made_last:
+                self.score[is_home] += 1
+                stats["PTS"] += 1
+                text = f"{shooter[1]} Free Throw {attempt} of {attempts} ({stats['PTS']} PTS)"
+            else:
+                text = f"MISS {shooter[1]} Free Throw {attempt} of {attempts}"
+            home, away = self._describe(is_home, text)
+            self._emit(3, 10 + attempt, home, away, scored=made_last, person1=self._person(shooter, is_home))
+        return made_last
+
+    def _rebound(self, shooting_home: bool) -> bool:
+        offensive = self.rng.random() < _OFFENSIVE_REBOUND_PROBABILITY
+        is_home = shooting_home if offensive else not shooting_home
+        if self.rng.random() < _TEAM_REBOUND_PROBABILITY:
+            home, away = self._describe(is_home, f"{self.teams[is_home].abbreviation} Rebound")
+            self._emit(4, 0, home, away, person1=self._person(None, is_home, team_event=True))
+        else:
+            rebounder = self._pick(is_home)
+            stats = self._player_stats(rebounder, is_home)
+            stats["REB"] += 1
+            home, away = self._describe(is_home, f"{rebounder[1]} REBOUND (Off:0 Def:{stats['REB']})")
+            self._emit(4, 0, home, away, person1=self._person(rebounder, is_home))
+        return is_home
+
+    def _possession(self, is_home: bool) -> bool:
+        """Plays one possession for `is_home` and returns whether the home team has the ball next."""
+        if self.rng.random() < _SUBSTITUTION_PROBABILITY:
+            self._substitution(self.rng.random() < 0.5)
+        if self.rng.random() < _TIMEOUT_PROBABILITY:
+            home, away = self._describe(is_home, f"{self.teams[is_home].abbreviation} Timeout: Regular (Full 1 Short 0)")
+            self._emit(9, 1, home, away, person1=self._person(None, is_home, team_event=True))
+
+        roll = self.rng.random()
+        ball_handler = self._pick(is_home)
+        if roll < _TURNOVER_PROBABILITY:
+            kind = self.rng.choice(_TURNOVER_KINDS)
+            self._player_stats(ball_handler, is_home)["TOV"] += 1
+            turnover = f"{ball_handler[1]} {kind} Turnover (P1.T{self._player_stats(ball_handler, is_home)['TOV']})"
+            if self.rng.random() < _STEAL_PROBABILITY:
+                stealer = self._pick(not is_home)
+                stats = self._player_stats(stealer, not is_home)
+                stats["STL"] += 1
+                home, away = self._describe(is_home, turnover, f"{stealer[1]} STEAL ({stats['STL']} STL)")
+                self._emit(
+                    5, 1, home, away, person1=self._person(ball_handler, is_home), person2=self._person(stealer, not is_home)
+                )
+            else:
+                home, away = self._describe(is_home, turnover)
+                self._emit(5, 2, home, away, person1=self._person(ball_handler, is_home))
+            return not is_home
+
+        if roll < _TURNOVER_PROBABILITY + _SHOOTING_FOUL_PROBABILITY:
+            fouler = self._pick(not is_home)
+            home, away = self._describe(not is_home, f"{fouler[1]} S.FOUL (P1.T1) (J.Official)")
+            self._emit(
+                6, 2, home, away, person1=self._person(fouler, not is_home), person2=self._person(ball_handler, is_home)
+            )
+            attempts = 3 if self.rng.random() < _THREE_POINT_PROBABILITY / 6 else 2
+            if self._free_throws(is_home, ball_handler, attempts):
+                return not is_home
+            self._tick(1, 2)
+            return self._rebound(is_home)
+
+        three = self.rng.random() < _THREE_POINT_PROBABILITY
+        distance = self.rng.randint(23, 28) if three else self.rng.randint(0, 21)
+        shot = f"{distance}' {'3PT ' if three else ''}{self.rng.choice(_SHOT_KINDS)}"
+        if self.rng.random() < _FIELD_GOAL_PROBABILITY:
+            points = 3 if three else 2
+            self.score[is_home] += points
+            stats = self._player_stats(ball_handler, is_home)
+            stats["PTS"] += points
+            text = f"{ball_handler[1]} {shot} ({stats['PTS']} PTS)"
+            assister = None
+            if self.rng.random() < 0.6:
+                assister = self._pick(is_home)
+                if assister != ball_handler:
+                    text += f" ({assister[1]} 1 AST)"
+                else:
+                    assister = None
+            home, away = self._describe(is_home, text)
+            self._emit(
+                1, 1, home, away, scored=True,
+                person1=self._person(ball_handler, is_home), person2=self._person(assister, is_home),
+            )
+            return not is_home
+
+        if self.rng.random() < _BLOCK_PROBABILITY:
+            blocker = self._pick(not is_home)
+            stats = self._player_stats(blocker, not is_home)
+            stats["BLK"] += 1
+            home, away = self._describe(is_home, f"MISS {ball_handler[1]} {shot}", f"{blocker[1]} BLOCK ({stats['BLK']} BLK)")
+            self._emit(
+                2, 1, home, away, person1=self._person(ball_handler, is_home), person3=self._person(blocker, not is_home)
+            )
+        else:
+            home, away = self._describe(is_home, f"MISS {ball_handler[1]} {shot}")
+            self._emit(2, 1, home, away, person1=self._person(ball_handler, is_home))
+        self._tick(0, 2)
+        return self._rebound(is_home)
+
+    def play(self) -> None:
+        periods = 4
+        while periods < 10 and (self.period <= periods):
+            self.clock = _PERIOD_SECONDS if self.period <= 4 else _OVERTIME_SECONDS
+            self._emit(12, 0, neutral_description=f"Start of {self.period} Period (7:30 PM EST)")
+            if self.period == 1:
+                home, away = self._pick(True), self._pick(False)
+                self._emit(
+                    10, 0, f"Jump Ball {home[1]} vs. {away[1]}",
+                    person1=self._person(home, True), person2=self._person(away, False),
+                )
+            is_home = self.rng.random() < 0.5
+            while self._tick(2, 20):
+                is_home = self._possession(is_home)
+            self._emit(13, 0, neutral_description=f"End of {self.period} Period (9:30 PM EST)")
+            if self.period >= 4 and self.period == periods and (
+                self.score[True] == self.score[False] or self.rng.random() < _OVERTIME_PROBABILITY
+            ):
+                periods += 1
+            self.period += 1
+
+    def play_by_play(self) -> pd.DataFrame:
+        return pd.DataFrame(self.rows, columns=PLAY_BY_PLAY_COLUMNS)
+
+    def box_score(self) -> pd.DataFrame:
+        rows = []
+        for is_home, team in self.teams.items():
+            for player in team.players:
+                stats = self.stats.get((player, is_home))
+                minutes = None if stats is None else f"{self.rng.randint(1, 40)}:{self.rng.randint(0, 59):02d}"
+                stats = stats or collections.Counter()
+                rows.append(
+                    [self.game_id, team.team_id, team.abbreviation, "City", player[0], player[1], None, None]
+                    + [None if minutes else "DNP - Coach's Decision", minutes]
+                    + [stats["REB"] if minutes else None, stats["STL"] if minutes else None]
+                    + [stats["BLK"] if minutes else None, stats["PTS"] if minutes else None]
+                )
+        return pd.DataFrame(rows, columns=BOX_SCORE_COLUMNS)
+
+
+def _game_id(season: str, season_type: str, index: int) -> str:
+    type_code = "4" if season_type == "Playoffs" else "2"
+    return f"00{type_code}{season[2:4]}{index + 1:05d}"
+
+
+def generate_games(
+    games: int = 1, seasons: tuple[str, ...] = ("2022-23",), season_type: str = "Regular Season", seed: int = 0
+) -> Iterator[SyntheticGame]:
+    """
+    Yields synthetic games with PlayByPlayV2 and BoxScoreTraditionalV2 shaped frames: realistic event mixes,
+    game clocks, running scores and description strings. `games` is the number of games per season.
+    """
+    rng = random.Random(seed)
+    for season in seasons:
+        for index in range(games):
+            home, away = rng.sample(_TEAMS, 2)
+            game_id = _game_id(season, season_type, index)
+            writer = _GameWriter(game_id, home, away, rng)
+            writer.play()
+            start_year = int(season[:4])
+            game_date = (pd.Timestamp(start_year, 10, 18) + pd.Timedelta(days=index * 180 // max(games, 1))).strftime("%Y-%m-%d")
+            yield SyntheticGame(game_id, season, season_type, game_date, home, away, writer.play_by_play(), writer.box_score())
+
+
+def generate_season_scale(seasons: int, season_type: str = "Regular Season", seed: int = 0) -> Iterator[SyntheticGame]:
+    season_names = tuple(f"{year}-{(year + 1) % 100:02d}" for year in range(2022 - seasons + 1, 2023))
+    return generate_games(_GAMES_PER_SEASON, season_names, season_type, seed)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from event_window import EventRuns, first_run_within_window
+
+_WINDOW_SECONDS = 7
+
+
+def _runs(positions, times, groups, values):
+    return EventRuns.from_events(np.array(positions), np.array(times), np.array(groups), np.array(values))
+
+
+def _first_runs(anchor_positions, anchor_times, anchor_groups, runs, stop_positions):
+    return first_run_within_window(
+        np.array(anchor_positions),
+        np.array(anchor_times),
+        np.array(anchor_groups),
+        runs,
+        _WINDOW_SECONDS,
+        np.array(stop_positions, dtype=np.int64),
+    ).tolist()
+
+
+def test_three_free_throws_are_one_run():
+    runs = _runs([2, 3, 4, 6], [100, 100, 100, 104], [1, 1, 1, 1], [1, 1, 1, 2])
+
+    assert runs.positions.tolist() == [2, 6]
+    assert runs.values.tolist() == [3, 2]
+    # The stock before the trip gets the whole trip, not just its first free throw
+    assert _first_runs([0], [98], [1], runs, [0, 2, 3, 4, 6]) == [0]
+
+
+def test_and_one_is_one_run():
+    runs = _runs([5, 6], [300, 300], [1, 1], [2, 1])
+
+    assert runs.values.tolist() == [3]
+    assert _first_runs([4], [296], [1], runs, [4, 5, 6]) == [0]
+
+
+def test_stop_in_between_closes_the_window():
+    runs = _runs([3], [104], [1], [2])
+
+    assert _first_runs([0], [100], [1], runs, [0, 1, 3]) == [-1]
+    assert _first_runs([0], [100], [1], runs, [0, 3]) == [0]
+
+
+def test_runs_of_the_next_period_are_not_matched():
+    runs = _runs([3], [721], [2], [2])
+
+    assert _first_runs([1], [719], [1], runs, [1, 2, 3]) == [-1]
+
+
+def test_window_bounds_are_inclusive():
+    runs = _runs([1, 3], [107, 200], [1, 1], [2, 3])
+
+    assert _first_runs([0], [100], [1], runs, [0, 1, 3]) == [0]
+    assert _first_runs([0], [99], [1], runs, [0, 1, 3]) == [-1]
+
+
+def test_without_runs_nothing_matches():
+    runs = _runs([], [], [], [])
+
+    assert _first_runs([0, 4], [10, 20], [1, 1], runs, [0, 4]) == [-1, -1]
@@ -0,0 +1,241 @@
+import collections
+import gc
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+import weakref
+
+import pytest
+from nba_api.stats.endpoints import PlayByPlayV2
+from nba_api.stats.library.http import NBAStatsHTTP
+
+import game_fetcher
+from game_fetcher import GameFetcher, TokenBucket, fetch_games
+from response_cache import ResponseCache, StatsRequestError
+
+_OK = "ok"
+
+
+def _payload(game_id: str) -> bytes:
+    return json.dumps(
+        {
+            "resultSets": [
+                {"name": "PlayByPlay", "headers": ["GAME_ID", "EVENTNUM"], "rowSet": [[game_id, 1]]},
+                {"name": "AvailableVideo", "headers": ["VIDEO_AVAILABLE_FLAG"], "rowSet": [[1]]},
+            ]
+        }
+    ).encode("utf-8")
+
+
+class StubStats:
+    """
+    Local stand-in for stats.nba.com. Every game id answers with the next response of its script: a status
+    code to fail with, a number of seconds to wait before answering, or "ok". Once the script is exhausted
+    the game keeps answering with `default`.
+    """
+
+    def __init__(self, default=_OK):
+        self.default = default
+        self.scripts = collections.defaultdict(list)
+        self.requests = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                game_id = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)["GameID"][0]
+                with stub._lock:
+                    stub.requests.append((game_id, time.monotonic()))
+                    script = stub.scripts[game_id]
+                    action = script.pop(0) if script else stub.default
+                if isinstance(action, float):
+                    stub._closed.wait(action)
+                    action = _OK
+                status, body = (200, _payload(game_id)) if action == _OK else (action, b"{}")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/stats/{{endpoint}}"
+
+    def request_counts(self) -> collections.Counter:
+        return collections.Counter(game_id for game_id, _ in self.requests)
+
+    def close(self) -> None:
+        self._closed.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ShortTimeoutPlayByPlay(PlayByPlayV2):
+    def __init__(self, game_id, get_request=True):
+        super().__init__(game_id, timeout=0.5, get_request=get_request)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = StubStats()
+    monkeypatch.setattr(NBAStatsHTTP, "base_url", stub.base_url)
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "responses.sqlite3"))
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Records the backoff of every retry, shortened so the tests do not wait for real."""
+    backoffs = []
+    backoff_seconds = game_fetcher._backoff_seconds
+
+    def recorded(attempt):
+        backoffs.append((attempt, backoff_seconds(attempt)))
+        return 0.01
+
+    monkeypatch.setattr(game_fetcher, "_backoff_seconds", recorded)
+    return backoffs
+
+
+def test_retries_throttled_requests(stub, cache, backoffs):
+    game_ids = ["0022200001", "0022200002", "0022200003"]
+    for game_id in game_ids:
+        stub.scripts[game_id] = [429, 503]
+
+    fetched = dict(fetch_games(PlayByPlayV2, game_ids, cache=cache, requests_per_second=100, burst=100))
+
+    assert sorted(fetched) == game_ids
+    for game_id, endpoint in fetched.items():
+        assert endpoint.play_by_play.get_data_frame()["GAME_ID"].tolist() == [game_id]
+    assert stub.request_counts() == {game_id: 3 for game_id in game_ids}
+    assert sorted(attempt for attempt, _ in backoffs) == [0, 0, 0, 1, 1, 1]
+
+
+def test_gives_up_after_max_retries(stub, cache, backoffs):
+    stub.default = 429
+
+    with pytest.raises(StatsRequestError) as error:
+        dict(fetch_games(PlayByPlayV2, ["0022200001"], cache=cache, max_retries=3, requests_per_second=100))
+
+    assert error.value.status_code == 429
+    assert stub.request_counts()["0022200001"] == 4
+    assert [attempt for attempt, _ in backoffs] == [0, 1, 2]
+
+
+def test_does_not_retry_client_errors(stub, cache, backoffs):
+    stub.scripts["0022200001"] = [404]
+
+    with pytest.raises(StatsRequestError):
+        dict(fetch_games(PlayByPlayV2, ["0022200001"], cache=cache))
+
+    assert stub.request_counts()["0022200001"] == 1
+    assert backoffs == []
+
+
+def test_retries_timeouts(stub, cache, backoffs):
+    stub.scripts["0022200001"] = [2.0]
+
+    fetched = dict(fetch_games(ShortTimeoutPlayByPlay, ["0022200001"], cache=cache, requests_per_second=100))
+
+    assert list(fetched) == ["0022200001"]
+    assert stub.request_counts()["0022200001"] == 2
+    assert [attempt for attempt, _ in backoffs] == [0]
+
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    for attempt in range(10):
+        ceiling = min(game_fetcher._BACKOFF_CAP_SECONDS, game_fetcher._BACKOFF_BASE_SECONDS * 2**attempt)
+        samples = [game_fetcher._backoff_seconds(attempt) for _ in range(200)]
+        assert all(0 <= sample <= ceiling for sample in samples)
+    assert max(game_fetcher._backoff_seconds(10) for _ in range(200)) > game_fetcher._BACKOFF_BASE_SECONDS * 2**3
+
+
+def test_cached_responses_skip_the_network(stub, cache):
+    dict(fetch_games(PlayByPlayV2, ["0022200001"], cache=cache))
+    dict(fetch_games(PlayByPlayV2, ["0022200001"], cache=cache))
+
+    assert stub.request_counts()["0022200001"] == 1
+
+
+def test_token_bucket_spaces_requests_after_the_burst():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+
+    # The first two requests use the burst, the other four wait 1 / 20 seconds each
+    assert time.monotonic() - start >= 4 / 20 * 0.9
+
+
+def test_requests_are_throttled_across_workers(stub, cache):
+    game_ids = [f"00222000{number:02d}" for number in range(8)]
+
+    dict(fetch_games(PlayByPlayV2, game_ids, cache=cache, max_workers=8, requests_per_second=10, burst=1))
+
+    request_times = sorted(request_time for _, request_time in stub.requests)
+    assert request_times[-1] - request_times[0] >= 7 / 10 * 0.9
+
+
+def test_slow_responses_are_fetched_concurrently(stub, cache):
+    game_ids = [f"00222000{number:02d}" for number in range(8)]
+    for game_id in game_ids:
+        stub.scripts[game_id] = [0.5]
+
+    start = time.monotonic()
+    dict(fetch_games(PlayByPlayV2, game_ids, cache=cache, max_workers=8, requests_per_second=100, burst=8))
+
+    assert time.monotonic() - start < 8 * 0.5 / 2
+
+
+def test_session_is_installed_once():
+    GameFetcher(max_workers=4)
+    session = NBAStatsHTTP.get_session()
+    GameFetcher(max_workers=4)
+    GameFetcher(max_workers=2)
+
+    assert NBAStatsHTTP.get_session() is session
+
+
+def test_yielded_endpoints_are_released(stub, cache):
+    game_ids = [f"00222000{number:02d}" for number in range(4)]
+    fetched = fetch_games(PlayByPlayV2, game_ids, cache=cache, max_workers=1, requests_per_second=100)
+
+    references = []
+    for _, endpoint in fetched:
+        references.append(weakref.ref(endpoint))
+        del endpoint
+        gc.collect()
+        # Only the endpoint being yielded may still be referenced by the fetcher
+        assert all(reference() is None for reference in references[:-1])
+
+
+def test_permanent_failures_cancel_the_queued_games(stub, cache, backoffs):
+    game_ids = [f"00222000{number:02d}" for number in range(8)]
+    stub.scripts[game_ids[0]] = [404]
+    for game_id in game_ids[1:]:
+        stub.scripts[game_id] = [0.5]
+
+    start = time.monotonic()
+    with pytest.raises(StatsRequestError):
+        dict(fetch_games(PlayByPlayV2, game_ids, cache=cache, max_workers=2, requests_per_second=100, burst=8))
+
+    assert time.monotonic() - start < 0.5
+    time.sleep(0.6)
+    # The two games in flight and at most one more picked up before the shutdown, none of the queued ones
+    assert len(stub.requests) <= 3
@@ -0,0 +1,79 @@
+import random
+
+import pandas as pd
+import pytest
+import requests
+
+import live_game
+from live_game import LiveGame, follow_game
+from play_patterns import OFFENSIVE_REBOUND_FLOW, PLAY_NAMES, PatternMatcher
+from play_table import PlayTable
+from synthetic_pbp import generate_games
+from value_stock_engine import compute_value_stocks
+
+
+def _plain(counts):
+    return {player_id: dict(player_counts) for player_id, player_counts in counts.items()}
+
+
+def _new_live_game(game_id):
+    return LiveGame(game_id, PatternMatcher((OFFENSIVE_REBOUND_FLOW,), PLAY_NAMES))
+
+
+def _assert_matches_batch(live, play_by_play):
+    play_table = PlayTable.from_play_by_play(play_by_play)
+    batch_counts = PatternMatcher((OFFENSIVE_REBOUND_FLOW,), PLAY_NAMES).scan(play_table)
+    pd.testing.assert_frame_equal(live.value_stock_totals(), compute_value_stocks(play_table))
+    assert _plain(live.counts[OFFENSIVE_REBOUND_FLOW.name]) == _plain(batch_counts[OFFENSIVE_REBOUND_FLOW.name])
+
+
+@pytest.fixture(scope="module")
+def games():
+    return list(generate_games(8, seed=11))
+
+
+def test_random_poll_sizes_match_the_batch_totals(games):
+    rng = random.Random(0)
+    for game in games:
+        play_by_play = game.play_by_play
+        live = _new_live_game(game.game_id)
+        polled = 0
+        while polled < len(play_by_play):
+            polled = min(len(play_by_play), polled + rng.randint(0, 40))
+            live.update(play_by_play.iloc[:polled])
+
+        _assert_matches_batch(live, play_by_play)
+        assert live.last_eventnum == play_by_play["EVENTNUM"].max()
+
+
+def test_corrected_events_are_processed_again(games):
+    game = games[0]
+    play_by_play = game.play_by_play
+    live = _new_live_game(game.game_id)
+    live.update(play_by_play.iloc[: len(play_by_play) // 2])
+
+    # The endpoint corrects an early event once the game has moved on, here a steal that is struck out
+    corrected = play_by_play.copy()
+    stock_row = corrected.index[corrected["HOMEDESCRIPTION"].str.contains("STEAL", na=False)][0]
+    assert stock_row < len(play_by_play) // 2
+    corrected.loc[stock_row, "HOMEDESCRIPTION"] = "Corrected play"
+    live.update(corrected.iloc[: len(play_by_play) // 2 + 10])
+    live.update(corrected)
+
+    _assert_matches_batch(live, corrected)
+
+
+def test_polling_survives_connection_errors(games, monkeypatch):
+    game = games[0]
+    monkeypatch.setattr(live_game.time, "sleep", lambda seconds: None)
+    responses = iter([requests.ConnectionError("reset"), requests.Timeout("slow"), game.play_by_play])
+
+    def fetch_play_by_play(game_id):
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    live = follow_game(_new_live_game(game.game_id), fetch_play_by_play, finished=lambda: True)
+
+    _assert_matches_batch(live, game.play_by_play)
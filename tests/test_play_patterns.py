@@ -0,0 +1,63 @@
+import collections
+import datetime
+
+import pytest
+
+from play_patterns import OFFENSIVE_REBOUND_FLOW, PLAY_NAMES, PatternMatcher, PatternStep, PlayPattern, Plays
+from play_table import PlayTable
+from synthetic_pbp import generate_games
+
+_TIME_FORMAT = "%M:%S"
+_FOLLOW_PLAYS = (Plays.FG_MADE, Plays.FG_MISSED, Plays.TURNOVER)
+
+
+def _pairwise_rebound_flow(play_by_play, counts):
+    """The pairwise loop of POC_drop0 that PatternMatcher replaced, keyed by player id like the matcher."""
+    plays = play_by_play.to_dict("records")
+    for play, next_play in zip(plays, plays[1:]):
+        elapsed = datetime.datetime.strptime(play["PCTIMESTRING"], _TIME_FORMAT) - datetime.datetime.strptime(
+            next_play["PCTIMESTRING"], _TIME_FORMAT
+        )
+        if (
+            play["EVENTMSGTYPE"] == Plays.OFFENSIVE_REBOUND
+            and elapsed.total_seconds() <= 7
+            and next_play["EVENTMSGTYPE"] in _FOLLOW_PLAYS
+        ):
+            counts[play["PLAYER1_ID"]][Plays(play["EVENTMSGTYPE"]).name] += 1
+            counts[play["PLAYER1_ID"]][Plays(next_play["EVENTMSGTYPE"]).name] += 1
+
+
+def _plain(counts):
+    return {player_id: dict(player_counts) for player_id, player_counts in counts.items()}
+
+
+@pytest.fixture(scope="module")
+def games():
+    return [game.play_by_play for game in generate_games(60, seed=5)]
+
+
+def test_rebound_flow_matches_the_pairwise_loop(games):
+    expected = collections.defaultdict(lambda: collections.defaultdict(int))
+    for play_by_play in games:
+        _pairwise_rebound_flow(play_by_play, expected)
+
+    play_table = PlayTable.concat(PlayTable.from_play_by_play(play_by_play) for play_by_play in games)
+    counts = PatternMatcher((OFFENSIVE_REBOUND_FLOW,), PLAY_NAMES).scan(play_table)
+
+    assert expected
+    assert _plain(counts[OFFENSIVE_REBOUND_FLOW.name]) == _plain(expected)
+
+
+def test_patterns_share_one_scan(games):
+    play_table = PlayTable.from_play_by_play(games[0])
+    second_chance_score = PlayPattern(
+        "SECOND_CHANCE_SCORE",
+        (PatternStep(frozenset({Plays.OFFENSIVE_REBOUND})), PatternStep(frozenset({Plays.FG_MADE}), 7, same_team=True)),
+        adjacent=False,
+    )
+
+    together = PatternMatcher((OFFENSIVE_REBOUND_FLOW, second_chance_score), PLAY_NAMES).scan(play_table)
+
+    for pattern in (OFFENSIVE_REBOUND_FLOW, second_chance_score):
+        alone = PatternMatcher((pattern,), PLAY_NAMES).scan(play_table)
+        assert _plain(together[pattern.name]) == _plain(alone[pattern.name])
@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+from response_cache import ResponseCache
+
+_PARAMETERS = {"GameID": "0022200001", "StartPeriod": 0}
+
+
+def _accessed_at(cache: ResponseCache) -> float:
+    with sqlite3.connect(cache.path) as connection:
+        (accessed_at,) = connection.execute("SELECT accessed_at FROM responses").fetchone()
+    return accessed_at
+
+
+def test_final_game_payloads_never_expire(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), unfinished_game_ttl=0)
+    cache.put("playbyplayv2", _PARAMETERS, "final", final=True)
+
+    assert cache.get("playbyplayv2", _PARAMETERS) == "final"
+
+
+def test_unfinished_game_payloads_expire(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), unfinished_game_ttl=0)
+    cache.put("playbyplayv2", _PARAMETERS, "in progress")
+
+    assert cache.get("playbyplayv2", _PARAMETERS) is None
+
+
+def test_schedule_payloads_expire_even_when_final(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), schedule_ttl=0)
+    cache.put("leaguegamelog", {"Season": "2022-23"}, "schedule", final=True)
+
+    assert cache.get("leaguegamelog", {"Season": "2022-23"}) is None
+
+
+def test_reads_are_written_in_batches(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    cache.put("playbyplayv2", _PARAMETERS, "final", final=True)
+    stored_at = _accessed_at(cache)
+    time.sleep(0.01)
+
+    assert cache.get("playbyplayv2", _PARAMETERS) == "final"
+    assert _accessed_at(cache) == stored_at
+
+    cache.flush()
+    assert _accessed_at(cache) > stored_at
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+import season_refresh
+from season_refresh import SeasonStore, refresh_season
+from synthetic_pbp import generate_games
+
+_SEASON = "2022-23"
+_SEASON_TYPE = "Regular Season"
+
+
+class _Endpoint:
+    def __init__(self, play_by_play):
+        self.play_by_play = play_by_play
+
+    def get_data_frames(self):
+        return [self.play_by_play]
+
+
+@pytest.fixture
+def released(monkeypatch):
+    """The game ids the season currently lists, served from synthetic games instead of stats.nba.com."""
+    games = {game.game_id: game.play_by_play for game in generate_games(30, seed=7)}
+    released = []
+    monkeypatch.setattr(season_refresh, "get_season_game_ids", lambda season, season_type: list(released))
+    monkeypatch.setattr(
+        season_refresh,
+        "fetch_games",
+        lambda endpoint_cls, game_ids, **options: ((game_id, _Endpoint(games[game_id])) for game_id in game_ids),
+    )
+    released.extend(games)
+    return released
+
+
+def _assert_totals_equal(actual, expected):
+    pd.testing.assert_frame_equal(actual.player_stats, expected.player_stats)
+    pd.testing.assert_frame_equal(actual.value_stocks, expected.value_stocks)
+    pd.testing.assert_frame_equal(actual.dimensions.players, expected.dimensions.players)
+    pd.testing.assert_frame_equal(actual.dimensions.teams, expected.dimensions.teams)
+
+
+def test_incremental_refresh_matches_a_full_rebuild(released, tmp_path):
+    game_ids = list(released)
+    store = SeasonStore(_SEASON, _SEASON_TYPE, str(tmp_path / "incremental"))
+    released[:] = game_ids[:12]
+    refresh_season(_SEASON, _SEASON_TYPE, store=store)
+    released[:] = game_ids
+    incremental = refresh_season(_SEASON, _SEASON_TYPE, store=store)
+
+    full_store = SeasonStore(_SEASON, _SEASON_TYPE, str(tmp_path / "full"))
+    full = refresh_season(_SEASON, _SEASON_TYPE, full_rebuild=True, store=full_store)
+
+    assert store.processed_game_ids() == set(game_ids)
+    _assert_totals_equal(incremental, full)
+
+
+def test_stored_totals_are_served_without_new_games(released, tmp_path):
+    store = SeasonStore(_SEASON, _SEASON_TYPE, str(tmp_path))
+    refreshed = refresh_season(_SEASON, _SEASON_TYPE, store=store)
+
+    _assert_totals_equal(refresh_season(_SEASON, _SEASON_TYPE, store=store), refreshed)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from play_table import PlayTable
+from synthetic_pbp import generate_games
+from value_stock_engine import compute_value_stocks
+
+_SIDES = {"HOME": "HOMEDESCRIPTION", "AWAY": "VISITORDESCRIPTION"}
+_KEPT_EVENTS = [9, 12, 13]
+_MAX_TIME_DIFF = 7
+
+
+def _per_game_value_stocks(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The per-game loop of value_stocks.py that the vectorized engine replaced, with its two documented fixes
+    (scores start from 0 - 0 and TIME_DIFF is exact) and POINTS_OFF_STOCK summing the whole scoring trip.
+    """
+    df = df.reset_index(drop=True)
+    made_shot = (df["EVENTMSGTYPE"] == 1) | ((df["EVENTMSGTYPE"] == 3) & df["SCORE"].notnull())
+    for side, description in _SIDES.items():
+        df[f"{side}_STOCKS"] = df[description].str.contains("BLOCK|STEAL", case=False, na=False)
+        df[f"{side}_BUCKET"] = df[description].notnull() & made_shot
+    scores = df["SCORE"].ffill().fillna("0 - 0").str.split(" - ", expand=True).astype(float)
+    df["AWAY_SCORE"], df["HOME_SCORE"] = scores[0], scores[1]
+
+    # Remove records that are neither stocks nor buckets, but keep timeouts and end of quarters
+    is_event = df[[f"{side}_{kind}" for side in _SIDES for kind in ("STOCKS", "BUCKET")]].any(axis=1)
+    df = df[is_event | df["EVENTMSGTYPE"].isin(_KEPT_EVENTS)]
+
+    clock = df["PCTIMESTRING"].str.split(":", expand=True).astype(int)
+    seconds_left = clock[0] * 60 + clock[1]
+    time_diff = seconds_left.shift() - seconds_left
+    attributed = np.where(df["PLAYER2_ID"].shift() != 0, df["PLAYER2_ID"].shift(), df["PLAYER3_ID"].shift())
+
+    results = []
+    for side in _SIDES:
+        points = df[f"{side}_SCORE"] - df[f"{side}_SCORE"].shift()
+        buckets = df[df[f"{side}_BUCKET"]]
+        new_trip = (buckets["PCTIMESTRING"] != buckets["PCTIMESTRING"].shift()) | (
+            buckets["PERIOD"] != buckets["PERIOD"].shift()
+        )
+        trip_points = points[buckets.index].groupby(new_trip.cumsum()).transform("sum")
+        basket_after_stock = df[f"{side}_STOCKS"].shift(fill_value=False) & df[f"{side}_BUCKET"]
+        selected = (basket_after_stock & (time_diff >= 0) & (time_diff <= _MAX_TIME_DIFF)).to_numpy()
+        results.append(
+            pd.DataFrame(
+                {
+                    "ATTRIBUTED_PLAYER_ID": attributed[selected],
+                    "VALUE_STOCK": 1,
+                    "POINTS_OFF_STOCK": trip_points[df.index[selected]].to_numpy(),
+                }
+            )
+        )
+    return pd.concat(results, ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def games():
+    return [game.play_by_play for game in generate_games(60, seed=3)]
+
+
+@pytest.fixture(scope="module")
+def play_table(games):
+    return PlayTable.concat(PlayTable.from_play_by_play(play_by_play) for play_by_play in games)
+
+
+def test_matches_the_per_game_loop(games, play_table):
+    expected = (
+        pd.concat([_per_game_value_stocks(play_by_play) for play_by_play in games], ignore_index=True)
+        .astype({"ATTRIBUTED_PLAYER_ID": np.int64})
+        .groupby("ATTRIBUTED_PLAYER_ID")
+        .agg({"VALUE_STOCK": "sum", "POINTS_OFF_STOCK": "sum"})
+        .reset_index()
+    )
+
+    pd.testing.assert_frame_equal(compute_value_stocks(play_table), expected)
+
+
+def test_per_game_totals_add_up_to_the_season(play_table):
+    season = compute_value_stocks(play_table)
+    by_game = compute_value_stocks(play_table, by_game=True)
+
+    summed = by_game.groupby("ATTRIBUTED_PLAYER_ID").agg({"VALUE_STOCK": "sum", "POINTS_OFF_STOCK": "sum"}).reset_index()
+    pd.testing.assert_frame_equal(summed, season)
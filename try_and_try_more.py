@@ -1,17 +1,18 @@
-import re
-from datetime import datetime
 from itertools import tee
 
 from nba_api.stats.endpoints import PlayByPlayV2
-from nba_api.stats.endpoints import LeagueGameFinder
+
+from game_catalog import select_game_ids
+from game_fetcher import fetch_games
+from instrumentation import start_run
+from play_keywords import STOCK
+from play_table import PlayTable
 
 
 _PLAYOFFS = "Playoffs"
 _2023 = "2022-23"
 _HOME_LOG = "HOMEDESCRIPTION"
 _AWAY_LOG = "VISITORDESCRIPTION"
-_STOCK_PATTERN = "BLOCK|STEAL"
-_TIME_FORMAT = "%M:%S"
 _MAX_TIME_DELTA = 7
 
 
@@ -22,32 +23,18 @@ def pairwise(iterable):
 
 
 def _get_game_ids_by_season_and_type(season, season_type):
-    games_data = LeagueGameFinder(season_nullable=season, season_type_nullable=season_type).get_normalized_dict()[
-        "LeagueGameFinderResults"
-    ]
-    return (dictionary["GAME_ID"] for dictionary in games_data)
+    # Only finished games: the play by play of a game in progress must not end up in the cache
+    return select_game_ids(season, season_type, completed=True)
 
 
 def _play_is_stock(play):
     if not (play[_HOME_LOG] and play[_AWAY_LOG]):
         return False
-    if not play[_HOME_LOG]:
-        return re.search(_STOCK_PATTERN, play[_AWAY_LOG])
-    if not play[_AWAY_LOG]:
-        return re.search(_STOCK_PATTERN, play[_HOME_LOG])
-    return re.search(_STOCK_PATTERN, play[_HOME_LOG] + play[_AWAY_LOG])
+    return ((play["HOME_KEYWORDS"] | play["AWAY_KEYWORDS"]) & STOCK) != 0
 
 
 def _is_time_valid(next_play, play):
-    return (
-        abs(
-            (
-                datetime.strptime(next_play["PCTIMESTRING"], _TIME_FORMAT)
-                - datetime.strptime(play["PCTIMESTRING"], _TIME_FORMAT)
-            ).total_seconds()
-        )
-        > _MAX_TIME_DELTA
-    )
+    return abs(next_play["CLOCK"] - play["CLOCK"]) > _MAX_TIME_DELTA
 
 
 def _is_scoring_play(play):
@@ -68,15 +55,23 @@ def _get_player_id_if_play_is_value_stock(next_play, play):
         return play["PLAYER3_ID"] if not play["PLAYER2_ID"] else play["PLAYER2_ID"]
 
 
+def get_value_stock_players_id(play_table):
+    play_by_play = play_table.plays.to_dict("records")
+    return [
+        _get_player_id_if_play_is_value_stock(next_play, play)
+        for next_play, play in pairwise(play_by_play)
+        if _get_player_id_if_play_is_value_stock(next_play, play)
+    ]
+
+
 if __name__ == "__main__":
-    game_ids = _get_game_ids_by_season_and_type(_2023, _PLAYOFFS)
-    for game_id in game_ids:
-        play_by_play = PlayByPlayV2(game_id=game_id).get_normalized_dict()["PlayByPlay"]
-        players_id = [
-            _get_player_id_if_play_is_value_stock(next_play, play)
-            for next_play, play in pairwise(play_by_play)
-            if _get_player_id_if_play_is_value_stock(next_play, play)
-        ]
+    recorder = start_run("try_and_try_more")
+    with recorder.stage("game_list"):
+        game_ids = _get_game_ids_by_season_and_type(_2023, _PLAYOFFS)
+    for game_id, endpoint in fetch_games(PlayByPlayV2, game_ids, final=True):
+        with recorder.time_game(game_id, "transform_seconds"):
+            players_id = get_value_stock_players_id(PlayTable.from_endpoint(endpoint))
         print(
             f"for game ID {game_id} we got {len(players_id)} players that blocked or stealed with next play ended less than 7 secods"
         )
+    recorder.write()
@@ -0,0 +1,211 @@
+import collections
+
+import attrs
+import numpy as np
+import pandas as pd
+
+from event_window import EventRuns, first_run_within_window
+from instrumentation import profiled
+from play_keywords import STOCK, TeamSide
+from play_table import PlayTable
+
+_FIELD_GOAL_MADE = 1
+_FREE_THROW = 3
+_KEPT_EVENTS = [9, 12, 13]  # Timeouts and start/end of periods
+MAX_TIME_DIFF = 7
+_MAX_PERIODS = 64  # Only used to give every (game, period) pair its own group code
+_GROUP_KEYS = ["ATTRIBUTED_PLAYER_ID"]
+# The PlayTable columns the computation reads, e.g. to load only those from the play store
+VALUE_STOCK_COLUMNS = [
+    "GAME_ID", "EVENTMSGTYPE", "PERIOD", "GAME_SECONDS", "SCORED", "AWAY_SCORE", "HOME_SCORE", "HOMEDESCRIPTION",
+    "VISITORDESCRIPTION", "HOME_KEYWORDS", "AWAY_KEYWORDS", "PLAYER2_ID", "PLAYER3_ID",
+]
+
+
+_SIDES = (TeamSide.HOME, TeamSide.AWAY)
+
+
+def _made_shots(plays: pd.DataFrame) -> np.ndarray:
+    return ((plays["EVENTMSGTYPE"] == _FIELD_GOAL_MADE) | ((plays["EVENTMSGTYPE"] == _FREE_THROW) & plays["SCORED"])).to_numpy()
+
+
+def _event_masks(plays: pd.DataFrame) -> tuple[dict[TeamSide, np.ndarray], dict[TeamSide, np.ndarray], np.ndarray]:
+    """The stocks and made baskets of each side, and the stops closing the window of the stocks before them."""
+    # Check if the description contains "BLOCK" or "STEAL"
+    stocks = {
+        TeamSide.HOME: (plays["HOME_KEYWORDS"].to_numpy() & STOCK) != 0,
+        TeamSide.AWAY: (plays["AWAY_KEYWORDS"].to_numpy() & STOCK) != 0,
+    }
+
+    # Check if it was a made basket or a made free throw
+    made_shot = _made_shots(plays)
+    buckets = {
+        TeamSide.HOME: plays["HOMEDESCRIPTION"].notnull().to_numpy() & made_shot,
+        TeamSide.AWAY: plays["VISITORDESCRIPTION"].notnull().to_numpy() & made_shot,
+    }
+
+    # Every stock, bucket, timeout and start/end of quarter closes the window of the stocks before it
+    stops = stocks[TeamSide.HOME] | stocks[TeamSide.AWAY] | buckets[TeamSide.HOME] | buckets[TeamSide.AWAY]
+    stops |= plays["EVENTMSGTYPE"].isin(_KEPT_EVENTS).to_numpy()
+    return stocks, buckets, stops
+
+
+def _attributed(plays: pd.DataFrame) -> np.ndarray:
+    # Attribute the stock to PLAYER2 (steal) or PLAYER3 (block) of the stock record
+    player2 = plays["PLAYER2_ID"].to_numpy()
+    return np.where(player2 != 0, player2, plays["PLAYER3_ID"].to_numpy()).astype(np.int64)
+
+
+def _points_scored(plays: pd.DataFrame, score_column: str, game_codes: np.ndarray) -> np.ndarray:
+    score = plays[score_column].to_numpy(dtype=np.int64)
+    points = np.diff(score, prepend=0)
+    new_game = np.ones(len(score), dtype=bool)
+    new_game[1:] = game_codes[1:] != game_codes[:-1]
+    points[new_game] = score[new_game]  # Scores start from 0 - 0 in every game
+    return points
+
+
+def _side_results(
+    plays: pd.DataFrame,
+    stocks: np.ndarray,
+    buckets: np.ndarray,
+    points: np.ndarray,
+    groups: np.ndarray,
+    stops: np.ndarray,
+    window_seconds: int,
+) -> pd.DataFrame:
+    seconds = plays["GAME_SECONDS"].to_numpy(dtype=np.int64)
+    bucket_rows = np.flatnonzero(buckets)
+    trips = EventRuns.from_events(bucket_rows, seconds[bucket_rows], groups[bucket_rows], points[bucket_rows])
+
+    stock_rows = np.flatnonzero(stocks)
+    matched = first_run_within_window(stock_rows, seconds[stock_rows], groups[stock_rows], trips, window_seconds, stops)
+    results = plays.iloc[stock_rows[matched >= 0]]
+    player_ids = _attributed(results)
+    credited = player_ids != 0  # A stock without any player in the record is not credited to anyone
+    return pd.DataFrame(
+        {
+            "GAME_ID": results["GAME_ID"].to_numpy()[credited],
+            "ATTRIBUTED_PLAYER_ID": player_ids[credited],
+            "VALUE_STOCK": 1,
+            "POINTS_OFF_STOCK": trips.values[matched[matched >= 0]][credited].astype(float),
+        }
+    )
+
+
+@profiled
+def compute_value_stocks(
+    play_table: PlayTable, by_game: bool = False, window_seconds: int = MAX_TIME_DIFF
+) -> pd.DataFrame:
+    """
+    Computes VALUE_STOCK and POINTS_OFF_STOCK per attributed player for any number of games in one vectorized
+    pass. A stock is a value stock when its side's next scoring trip comes within `window_seconds` in the same
+    period, before any other stock, basket, timeout or period boundary. POINTS_OFF_STOCK sums the whole trip,
+    e.g. an and-one or every free throw of the trip. With `by_game` the totals are kept per GAME_ID as well.
+    Players are keyed by ATTRIBUTED_PLAYER_ID only, see `Dimensions` for their names.
+    """
+    plays = play_table.plays
+    game_codes = plays["GAME_ID"].cat.codes.to_numpy()
+    groups = game_codes.astype(np.int64) * _MAX_PERIODS + plays["PERIOD"].to_numpy()
+
+    stocks, buckets, stops = _event_masks(plays)
+    stops = np.flatnonzero(stops)
+
+    results_df = pd.concat(
+        [
+            _side_results(
+                plays, stocks[TeamSide.HOME], buckets[TeamSide.HOME], _points_scored(plays, "HOME_SCORE", game_codes),
+                groups, stops, window_seconds,
+            ),
+            _side_results(
+                plays, stocks[TeamSide.AWAY], buckets[TeamSide.AWAY], _points_scored(plays, "AWAY_SCORE", game_codes),
+                groups, stops, window_seconds,
+            ),
+        ],
+        ignore_index=True,
+    )
+    group_keys = ["GAME_ID"] + _GROUP_KEYS if by_game else _GROUP_KEYS
+    return (
+        results_df.groupby(group_keys, observed=True)
+        .agg({"VALUE_STOCK": "sum", "POINTS_OFF_STOCK": "sum"})
+        .reset_index()
+    )
+
+
+@attrs.frozen
+class _PendingStock:
+    period: int
+    seconds: int
+    attributed_to: int
+
+
+@attrs.define
+class ValueStockTracker:
+    """
+    The value stocks of one game in progress, updated with each batch of new plays in O(new plays) and giving
+    the same totals as `compute_value_stocks` over the plays seen so far. A stock stays pending until its
+    side's next scoring trip, the next stop (any stock, basket, timeout or period boundary) or the end of its
+    time window, and a credited trip keeps adding points while its free throws come in.
+    """
+
+    window_seconds: int = MAX_TIME_DIFF
+    scores: dict[TeamSide, int] = attrs.field(factory=lambda: dict.fromkeys(_SIDES, 0))
+    _pending: dict[TeamSide, _PendingStock] = attrs.field(init=False, factory=dict)
+    _trips: dict[TeamSide, tuple[int, int]] = attrs.field(init=False, factory=dict)
+    _credited: dict[TeamSide, int | None] = attrs.field(init=False, factory=dict)
+    _value_stocks: collections.Counter = attrs.field(init=False, factory=collections.Counter)
+    _points: collections.Counter = attrs.field(init=False, factory=collections.Counter)
+
+    def _close_expired(self, period: int, seconds: int) -> None:
+        for side, pending in list(self._pending.items()):
+            if pending.period != period or seconds - pending.seconds > self.window_seconds:
+                del self._pending[side]
+
+    def _score_trip(self, side: TeamSide, period: int, seconds: int, points: int) -> None:
+        # Baskets of one side at the same game time are one trip, e.g. an and-one or every free throw
+        if self._trips.get(side) != (period, seconds):
+            self._trips[side] = (period, seconds)
+            pending = self._pending.get(side)
+            credited = pending.attributed_to if pending is not None and seconds >= pending.seconds else None
+            self._credited[side] = credited
+            if credited is not None:
+                self._value_stocks[credited] += 1
+        credited = self._credited[side]
+        if credited is not None:
+            self._points[credited] += points
+
+    def update(self, plays: pd.DataFrame) -> None:
+        """Feeds the next plays of the game, in order, as `PlayTable` rows."""
+        stocks, buckets, stops = _event_masks(plays)
+        periods = plays["PERIOD"].to_numpy()
+        seconds = plays["GAME_SECONDS"].to_numpy()
+        scored = plays["SCORED"].to_numpy()
+        home_scores = plays["HOME_SCORE"].to_numpy()
+        away_scores = plays["AWAY_SCORE"].to_numpy()
+        player_ids = _attributed(plays)
+
+        for row in range(len(plays)):
+            period, second = int(periods[row]), int(seconds[row])
+            self._close_expired(period, second)
+            previous_scores = self.scores
+            if scored[row]:
+                self.scores = {TeamSide.HOME: int(home_scores[row]), TeamSide.AWAY: int(away_scores[row])}
+            for side in _SIDES:
+                if buckets[side][row]:
+                    self._score_trip(side, period, second, self.scores[side] - previous_scores[side])
+            if stops[row]:
+                self._pending.clear()
+            for side in _SIDES:
+                if stocks[side][row] and player_ids[row] != 0:
+                    self._pending[side] = _PendingStock(period, second, int(player_ids[row]))
+
+    def totals(self) -> pd.DataFrame:
+        """The value stocks so far in the columns of `compute_value_stocks`."""
+        player_ids = sorted(self._value_stocks)
+        return pd.DataFrame(
+            {
+                "ATTRIBUTED_PLAYER_ID": np.array(player_ids, dtype=np.int64),
+                "VALUE_STOCK": np.array([self._value_stocks[player_id] for player_id in player_ids], dtype=np.int64),
+                "POINTS_OFF_STOCK": np.array([self._points[player_id] for player_id in player_ids], dtype=float),
+            }
+        )